@@ -3,10 +3,401 @@
 from __future__ import annotations
 import sys
 import math
+import time
+import heapq
+import bisect
+import functools
+import io
+import zlib
+from array import array
+from collections import deque
+from contextlib import contextmanager, nullcontext
 from enum import Enum
 
 ORE_THRESHOLD = 20
 ROBOT_SPEED = 4
+RADAR_RANGE = 4
+UNKNOWN_ORE = -1 # "?" в массивах карты
+
+# Оценка позиции для радара
+EXPLORATION_BONUS = 1
+ORE_BONUS = 10
+ENEMY_RADAR_BONUS = 1
+TRAP_BONUS = -1000
+DISTANCE_COEFF = 0.01
+TIME_DECAY_COEFF = 0.003
+
+# Распределение шахтёров по руде
+ASSIGNMENT_CANDIDATES = 8 # Ближайших клеток на робота
+ASSIGNMENT_TIME_BUDGET = 0.01 # Секунд. Не успели собрать задачу - раздаём жадно
+
+# Пересчитывать всё по полной карте вместо изменений за ход. Для проверки
+FULL_RESCAN = False
+
+# Время на ход, секунды
+TURN_TIME_LIMIT = 0.05
+FIRST_TURN_TIME_LIMIT = 1
+TURN_SAFETY_MARGIN = 0.01 # Заканчиваем думать за столько до лимита
+
+# Замеры времени по фазам хода
+PROFILE = False
+PROFILE_WINDOW = 200 # Последних ходов на фазу
+PROFILE_REPORT_EVERY = 50 # Ходов между сводками, 0 - не выводить
+PROFILE_FILE = None # Дописывать сводки, пропуски и перерасход времени в файл вместо stderr
+
+
+def solve_assignment(costs: list[list[int]]) -> list[int]:
+    '''
+    Венгерский алгоритм: строке i ставит в соответствие столбец result[i]
+    так, чтобы сумма costs была минимальной. Столбцов не меньше, чем строк.
+    '''
+    rows = len(costs)
+    columns = len(costs[0])
+    u = [0] * (rows + 1)
+    v = [0] * (columns + 1)
+    owner = [0] * (columns + 1) # Какая строка (с 1) заняла столбец
+    way = [0] * (columns + 1)
+    for row in range(1, rows + 1):
+        owner[0] = row
+        column = 0
+        min_reduced = [math.inf] * (columns + 1)
+        used = [False] * (columns + 1)
+        while owner[column] != 0:
+            used[column] = True
+            current_row = owner[column]
+            delta = math.inf
+            next_column = 0
+            for j in range(1, columns + 1):
+                if not used[j]:
+                    reduced = costs[current_row - 1][j - 1] - u[current_row] - v[j]
+                    if reduced < min_reduced[j]:
+                        min_reduced[j] = reduced
+                        way[j] = column
+                    if min_reduced[j] < delta:
+                        delta = min_reduced[j]
+                        next_column = j
+            for j in range(columns + 1):
+                if used[j]:
+                    u[owner[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_reduced[j] -= delta
+            column = next_column
+        while column:
+            previous_column = way[column]
+            owner[column] = owner[previous_column]
+            column = previous_column
+    result = [-1] * rows
+    for j in range(1, columns + 1):
+        if owner[j]:
+            result[owner[j] - 1] = j - 1
+    return result
+
+
+class InputReader:
+    '''
+    Читает токены из stdin кусками вместо input() на каждую строку:
+    один split() на кусок, дальше только индекс. read1 отдаёт то, что
+    судья уже прислал, так что следующего хода не ждём.
+    '''
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdin.buffer
+        self.tokens: list[bytes] = []
+        self.position = 0
+        self.partial = b"" # Хвост куска, оборванный посреди токена
+        self.recorder: ReplayRecorder | None = None
+
+    def fill(self):
+        while self.position >= len(self.tokens):
+            chunk = self.stream.read1(1 << 16)
+            if not chunk:
+                if not self.partial:
+                    raise EOFError("EOF when reading a token")
+                self.tokens, self.position, self.partial = [self.partial], 0, b""
+                return
+            data = self.partial + chunk
+            self.tokens = data.split()
+            self.position = 0
+            self.partial = b""
+            if self.tokens and not data[-1:].isspace():
+                self.partial = self.tokens.pop()
+
+    def read_tokens(self, count: int) -> list[bytes]:
+        result = []
+        while len(result) < count:
+            self.fill()
+            taken = self.tokens[self.position:self.position + count - len(result)]
+            self.position += len(taken)
+            result += taken
+        if self.recorder is not None:
+            self.recorder.add_input(result)
+        return result
+
+    def read_ints(self, count: int) -> list[int]:
+        return list(map(int, self.read_tokens(count)))
+
+    def read_int(self) -> int:
+        return int(self.read_tokens(1)[0])
+
+
+class CommandWriter:
+    '''
+    Копит команды хода и отправляет их одной записью с одним flush.
+    '''
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout.buffer
+        self.lines: list[str] = []
+        self.recorder: ReplayRecorder | None = None
+
+    def write(self, line: str):
+        self.lines.append(line)
+
+    def flush(self):
+        # Команды уходят раз в ход, так что это и есть граница хода для записи
+        if self.recorder is not None:
+            self.recorder.end_turn(self.lines)
+        if self.lines:
+            self.stream.write(("\n".join(self.lines) + "\n").encode())
+            self.lines.clear()
+        self.stream.flush()
+
+
+class Profiler:
+    '''
+    Суммирует время каждой фазы за ход, хранит последние window ходов
+    и выводит p50/p95/max. Выключенный ничего не стоит: profile()
+    возвращает функцию как есть, phase() - общий пустой контекст.
+    '''
+    def __init__(self, enabled: bool, window: int, report_every: int, path: str | None = None):
+        self.enabled = enabled
+        self.window = window
+        self.report_every = report_every
+        self.path = path
+        self.current: dict[str, float] = {} # Фаза -> секунд за текущий ход
+        self.history: dict[str, deque[float]] = {}
+        self.turns = 0
+        self.disabled_phase = nullcontext()
+
+    def profile(self, name: str | None = None):
+        def decorator(function):
+            if not self.enabled:
+                return function
+            phase = name or function.__name__
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.add(phase, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return self.disabled_phase
+        return self.timed_phase(name)
+
+    @contextmanager
+    def timed_phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, duration: float):
+        self.current[name] = self.current.get(name, 0) + duration
+
+    def end_turn(self):
+        if not self.enabled:
+            return
+        for name, duration in self.current.items():
+            if name not in self.history:
+                self.history[name] = deque(maxlen=self.window)
+            self.history[name].append(duration)
+        self.current.clear()
+        self.turns += 1
+        if self.report_every and self.turns % self.report_every == 0:
+            self.report()
+
+    def summary(self) -> list[str]:
+        lines = [f"Ход {self.turns}, мс за ход по последним {self.window}:"]
+        for name, durations in self.history.items():
+            ordered = sorted(durations)
+            p50 = ordered[len(ordered) // 2]
+            p95 = ordered[min(len(ordered) - 1, len(ordered) * 95 // 100)]
+            lines.append(f"  {name}: p50 {p50 * 1000:.2f} p95 {p95 * 1000:.2f} max {ordered[-1] * 1000:.2f} ({len(ordered)} ходов)")
+        return lines
+
+    def report(self):
+        text = "\n".join(self.summary()) + "\n"
+        if self.path:
+            with open(self.path, "a") as file:
+                file.write(text)
+        else:
+            sys.stderr.write(text)
+            sys.stderr.flush()
+
+
+class ReplayRecorder:
+    '''
+    Пишет всё прочитанное (по строке на чтение) и команды каждого хода.
+    Строка, совпавшая со строкой на том же месте прошлого хода, занимает
+    один нулевой байт, так что неизменные строки карты почти ничего не
+    стоят. Числа - varint, всё сжато zlib и сбрасывается каждый ход:
+    в конце игры судья бота просто убивает.
+    '''
+    MAGIC = b"CRR1"
+
+    def __init__(self, path: str | None = None):
+        self.file = open(path, "wb") if path else None
+        if self.file:
+            self.file.write(self.MAGIC)
+        self.compressor = zlib.compressobj(9)
+        self.inputs: list[bytes] = []
+        self.previous: tuple[list[bytes], list[bytes]] = ([], [])
+        self.turns: list[tuple[list[bytes], list[bytes]]] = [] # (ввод, команды)
+
+    def add_input(self, tokens: list[bytes]):
+        self.inputs.append(b" ".join(tokens))
+
+    def end_turn(self, commands: list[str]):
+        outputs = [command.encode() for command in commands]
+        if self.file:
+            record = bytearray()
+            self.encode_lines(record, self.inputs, self.previous[0])
+            self.encode_lines(record, outputs, self.previous[1])
+            self.file.write(self.compressor.compress(bytes(record)) + self.compressor.flush(zlib.Z_SYNC_FLUSH))
+            self.file.flush()
+        self.turns.append((self.inputs, outputs))
+        self.previous = (self.inputs, outputs)
+        self.inputs = []
+
+    @staticmethod
+    def encode_lines(record: bytearray, lines: list[bytes], previous: list[bytes]):
+        ReplayRecorder.write_varint(record, len(lines))
+        for i, line in enumerate(lines):
+            if i < len(previous) and previous[i] == line:
+                record.append(0)
+            else:
+                ReplayRecorder.write_varint(record, len(line) + 1)
+                record += line
+
+    @staticmethod
+    def decode_lines(data: bytes, position: int, previous: list[bytes]) -> tuple[list[bytes], int]:
+        count, position = ReplayRecorder.read_varint(data, position)
+        lines = []
+        for i in range(count):
+            length, position = ReplayRecorder.read_varint(data, position)
+            if length == 0:
+                lines.append(previous[i])
+            else:
+                lines.append(data[position:position + length - 1])
+                position += length - 1
+        return lines, position
+
+    @staticmethod
+    def write_varint(record: bytearray, value: int):
+        while value >= 0x80:
+            record.append(value & 0x7F | 0x80)
+            value >>= 7
+        record.append(value)
+
+    @staticmethod
+    def read_varint(data: bytes, position: int) -> tuple[int, int]:
+        value = 0
+        shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value, position
+            shift += 7
+
+    @staticmethod
+    def load(path: str) -> list[tuple[list[bytes], list[bytes]]]:
+        with open(path, "rb") as file:
+            data = file.read()
+        if data[:len(ReplayRecorder.MAGIC)] != ReplayRecorder.MAGIC:
+            raise ValueError(f"{path} - не запись Crystal Rush")
+        data = zlib.decompressobj().decompress(data[len(ReplayRecorder.MAGIC):])
+        turns = []
+        previous: tuple[list[bytes], list[bytes]] = ([], [])
+        position = 0
+        while position < len(data):
+            inputs, position = ReplayRecorder.decode_lines(data, position, previous[0])
+            outputs, position = ReplayRecorder.decode_lines(data, position, previous[1])
+            previous = (inputs, outputs)
+            turns.append(previous)
+        return turns
+
+
+class TurnScheduler:
+    '''
+    Часы хода, запускаются, когда пришёл первый ввод хода. Между шагами
+    проверяем expired() или time_left() и останавливаемся за safety_margin
+    до лимита, отдавая дешёвый запасной вариант. Пропущенные шаги и ходы,
+    которые всё равно вылезли за лимит, пишем в path или stderr, когда
+    команды хода уже отправлены.
+    '''
+    def __init__(self, time_limit: float, first_time_limit: float, safety_margin: float, path: str | None = None):
+        self.time_limit = time_limit
+        self.first_time_limit = first_time_limit
+        self.safety_margin = safety_margin
+        self.path = path
+        self.turn = 0
+        self.running = False
+        self.start = 0.0
+        self.limit = 0.0
+        self.deadline = 0.0
+        self.events: list[str] = [] # Пропуски и перерасход этого хода, ещё не записанные
+
+    def start_turn(self):
+        # Повторный вызов внутри хода ничего не делает: часы первого хода
+        # идут с начального ввода
+        if self.running:
+            return
+        self.running = True
+        self.turn += 1
+        self.start = time.perf_counter()
+        self.limit = self.start + (self.first_time_limit if self.turn == 1 else self.time_limit)
+        self.deadline = self.limit - self.safety_margin
+
+    def time_left(self) -> float:
+        return self.deadline - time.perf_counter()
+
+    def expired(self) -> bool:
+        return time.perf_counter() >= self.deadline
+
+    def skip(self, step: str):
+        self.events.append(f"Ход {self.turn}: не успели {step}")
+
+    def finish_turn(self):
+        self.running = False
+        elapsed = time.perf_counter() - self.start
+        if self.start + elapsed > self.limit:
+            self.events.append(f"Ход {self.turn}: вышли за лимит, {elapsed * 1000:.1f} мс")
+        if self.events:
+            self.report()
+
+    def report(self):
+        # Пишем каждый ход, а не в конце: по окончании игры судья бота просто убивает
+        text = "\n".join(self.events) + "\n"
+        self.events.clear()
+        if self.path:
+            with open(self.path, "a") as file:
+                file.write(text)
+        else:
+            sys.stderr.write(text)
+            sys.stderr.flush()
+
+
+reader = InputReader()
+writer = CommandWriter()
+scheduler = TurnScheduler(TURN_TIME_LIMIT, FIRST_TURN_TIME_LIMIT, TURN_SAFETY_MARGIN, PROFILE_FILE)
+profiler = Profiler(PROFILE, PROFILE_WINDOW, PROFILE_REPORT_EVERY, PROFILE_FILE)
 
 
 class Team(Enum):
@@ -20,24 +411,44 @@ class Item(Enum):
     ORE = 4
 
 class Point:
-    def __init__(self, x: int, y: int):
-        self.x = x
-        self.y = y
+    '''
+    Неизменяемая точка. Point(x, y) каждый раз возвращает один и тот же
+    объект, поэтому новых объектов в циклах не создаём, а сравниваем по is.
+    Клеткам карты GameMap.bind_points раздаёт индексы, и разность двух
+    таких точек берётся из таблицы расстояний.
+    '''
+    __slots__ = ("x", "y", "index")
+    _interned: dict[tuple[int, int], Point] = {}
+    distances: list[list[int]] = [] # Манхэттен между клетками карты по индексам
+
+    def __new__(cls, x: int, y: int):
+        point = cls._interned.get((x, y))
+        if point is None:
+            point = object.__new__(cls)
+            object.__setattr__(point, "x", x)
+            object.__setattr__(point, "y", y)
+            object.__setattr__(point, "index", -1) # Вне карты
+            cls._interned[(x, y)] = point
+        return point
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Point is immutable")
     
     def __eq__(self, other):
         if isinstance(other, Point):
-            return (self.x, self.y) == (other.x, other.y)
+            return self is other
         raise TypeError(f"Can't compare Point with {type(other)}")
     
     # Манхэттен
     def __sub__(self, other: Point) -> int:
+        if self.index >= 0 and other.index >= 0:
+            return Point.distances[self.index][other.index]
         return abs(self.x - other.x) + abs(self.y - other.y)
     
     def __add__(self, other: Point) -> Point:
         return Point(self.x + other.x, self.y + other.y)
     
-    def __hash__(self):
-        return hash((self.x, self.y))
+    __hash__ = object.__hash__
     
     def __repr__(self):
         return f"Point({self.x}, {self.y})"
@@ -45,40 +456,87 @@ class Point:
 DIRECTIONS = [Point(1, 0), Point(0, 1), Point(-1, 0), Point(0, -1), Point(0, 0)]
 
 class Cell:
-    def __init__(self, position: Point, ore: int | None, hole: bool):
-        self.position: Point = position
-        self.__ore: int | None = ore
-        self.previous_ore: int | None = ore
-        self.predicted_ore: int | None = ore
-        self.__hole: bool = hole
-        self.previous_hole: bool = False
-        self.ally_radar: bool = False
-        self.radar_exploration_score: int = 0
-        self.destroyed_enemy_radar: bool = False
-    
+    '''
+    Вид на одну клетку карты. Сами данные лежат в массивах GameMap,
+    тут только индекс, так что держать и создавать их дёшево.
+    '''
+    __slots__ = ("game_map", "index", "position")
+
+    def __init__(self, game_map: GameMap, index: int):
+        self.game_map: GameMap = game_map
+        self.index: int = index
+        self.position: Point = game_map.points[index]
 
     @property
-    def hole(self):
-        return self.__hole
+    def hole(self) -> bool:
+        return bool(self.game_map.hole[self.index])
     
     @hole.setter
     def hole(self, new_value: bool):
-        self.previous_hole = self.__hole
-        self.__hole = new_value
+        self.game_map.previous_hole[self.index] = self.game_map.hole[self.index]
+        self.game_map.hole[self.index] = new_value
+
+    @property
+    def previous_hole(self) -> bool:
+        return bool(self.game_map.previous_hole[self.index])
     
     @property
-    def ore(self):
-        return self.__ore
+    def ore(self) -> int | None:
+        ore = self.game_map.ore[self.index]
+        return None if ore == UNKNOWN_ORE else ore
     
     @ore.setter
     def ore(self, new_value: int | None):
-        self.previous_ore = self.ore
-        self.__ore = new_value
-        self.predicted_ore = self.__ore
-    
+        game_map = self.game_map
+        game_map.previous_ore[self.index] = game_map.ore[self.index]
+        game_map.ore[self.index] = UNKNOWN_ORE if new_value is None else new_value
+        game_map.predicted_ore[self.index] = game_map.ore[self.index]
+
+    @property
+    def previous_ore(self) -> int | None:
+        ore = self.game_map.previous_ore[self.index]
+        return None if ore == UNKNOWN_ORE else ore
+
+    @property
+    def predicted_ore(self) -> int | None:
+        ore = self.game_map.predicted_ore[self.index]
+        return None if ore == UNKNOWN_ORE else ore
+
+    @predicted_ore.setter
+    def predicted_ore(self, new_value: int | None):
+        self.game_map.predicted_ore[self.index] = UNKNOWN_ORE if new_value is None else new_value
+
     @property
     def has_ore(self) -> bool:
-        return bool(self.predicted_ore and self.predicted_ore > 0)
+        return self.game_map.predicted_ore[self.index] > 0
+
+    @property
+    def ally_radar(self) -> bool:
+        return bool(self.game_map.ally_radar[self.index])
+
+    @ally_radar.setter
+    def ally_radar(self, new_value: bool):
+        self.game_map.ally_radar[self.index] = new_value
+
+    @property
+    def destroyed_enemy_radar(self) -> bool:
+        return bool(self.game_map.destroyed_enemy_radar[self.index])
+
+    @destroyed_enemy_radar.setter
+    def destroyed_enemy_radar(self, new_value: bool):
+        self.game_map.destroyed_enemy_radar[self.index] = new_value
+
+
+class MapChanges:
+    '''
+    Что изменилось на карте за последний update_map. Контроллер смотрит
+    только сюда, а не бегает по всем клеткам.
+    '''
+    def __init__(self):
+        self.new_holes: list[Cell] = []
+        self.ore_decreased: list[Cell] = [] # Руды стало меньше, чем мы думали
+        self.revealed: list[Cell] = [] # Была неизвестна, стала видна
+        self.ore_changed: list[Cell] = [] # Судья прислал не то же, что в прошлый раз
 
 
 class Robot:
@@ -122,7 +580,7 @@ class Robot:
     def act(self):
         if not self.__command:
             self.WAIT("Я лосось поющий, на пляжу ляжущий")
-        print(self.__command)
+        writer.write(self.__command)
         self.__command = None
         # Если увидели поющего лосося - забыли обновить команду. 
         # Всё понятно и логично.
@@ -141,42 +599,257 @@ class Robot:
         return self.position.x != -1 and self.position.y != -1
         
 
+class RobotIndex:
+    '''
+    Живые роботы, разложенные по клеткам. Пересобирается раз в ход
+    в GameState.update_state, чтобы вопрос "кто стоит рядом с клеткой"
+    стоил обход маленького ромба, а не всех роботов.
+    '''
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.buckets: list[list[Robot]] = [[] for _ in range(width * height)]
+        self.occupied: list[int] = []
+        self.__diamonds: dict[int, list[tuple[int, int]]] = {}
+
+    def rebuild(self, robots: list[Robot]):
+        for index in self.occupied:
+            self.buckets[index].clear()
+        self.occupied = []
+        for robot in robots:
+            if robot.is_alive:
+                index = robot.position.y * self.width + robot.position.x
+                self.buckets[index].append(robot)
+                self.occupied.append(index)
+
+    def diamond(self, distance: int) -> list[tuple[int, int]]:
+        if distance not in self.__diamonds:
+            self.__diamonds[distance] = [(xdiff, ydiff) for xdiff in range(-distance, distance + 1)
+                                         for ydiff in range(-(distance - abs(xdiff)), distance - abs(xdiff) + 1)]
+        return self.__diamonds[distance]
+
+    def has_robot_within(self, position: Point, distance: int, team: Team | None = None) -> bool:
+        for xdiff, ydiff in self.diamond(distance):
+            x = position.x + xdiff
+            y = position.y + ydiff
+            if 0 <= x < self.width and 0 <= y < self.height:
+                for robot in self.buckets[y * self.width + x]:
+                    if team is None or robot.team == team:
+                        return True
+        return False
+
+
+class OreIndex:
+    '''
+    Безопасные клетки с рудой (has_ore и не в dangerous_cells), разложенные
+    по столбцам: в каждом столбце отсортированный список y. Плюс текущая
+    сумма видимой руды вне опасных клеток.
+    '''
+    def __init__(self, game_map: GameMap):
+        self.game_map = game_map
+        self.columns: list[list[int]] = [[] for _ in range(game_map.width)]
+        self.safe: list[bool] = [False] * (game_map.width * game_map.height)
+        self.visible_ore: int = 0
+        # Сколько руды из клетки сейчас учтено в visible_ore
+        self.visible_ore_cells: list[int] = [0] * (game_map.width * game_map.height)
+        # Клетки, которые контроллер поменял посреди хода. На следующем ходу
+        # update_map сбросит им predicted_ore, их надо будет перепроверить
+        self.touched: list[Cell] = []
+
+    def __refresh(self, cell: Cell, dangerous: bool):
+        index = self.game_map.index(cell.position)
+        safe = cell.has_ore and not dangerous
+        if safe != self.safe[index]:
+            self.safe[index] = safe
+            column = self.columns[cell.position.x]
+            if safe:
+                bisect.insort(column, cell.position.y)
+            else:
+                column.pop(bisect.bisect_left(column, cell.position.y))
+
+    def update(self, cell: Cell, dangerous: bool):
+        # Посреди хода: видимую руду не трогаем, она считается раз в ход
+        self.__refresh(cell, dangerous)
+        self.touched.append(cell)
+
+    def sync(self, cells: list[Cell], dangerous_cells: set[Point]):
+        for cell in cells + self.touched:
+            dangerous = cell.position in dangerous_cells
+            self.__refresh(cell, dangerous)
+            index = self.game_map.index(cell.position)
+            value = cell.ore if cell.ore and not dangerous else 0
+            self.visible_ore += value - self.visible_ore_cells[index]
+            self.visible_ore_cells[index] = value
+        self.touched = []
+
+    def nearest(self, position: Point, count: int = 1) -> list[Cell]:
+        '''
+        count клеток с наименьшим (расстояние до position + x), то есть
+        дойти и отнести на базу. При равенстве - первые по порядку cells.
+        Столбцы дальше position справа дороже с каждым шагом, на них и обрываемся.
+        '''
+        best: list[tuple[int, int, int]] = [] # (оценка, y, x)
+        for x, column in enumerate(self.columns):
+            column_cost = abs(x - position.x) + x
+            if len(best) == count and column_cost > best[-1][0]:
+                if x > position.x:
+                    break
+                continue
+            if not column:
+                continue
+            # Расходимся от y робота в обе стороны, пока есть шанс попасть в лучшие.
+            # При равном расстоянии сначала верхняя клетка, как в порядке cells
+            below = bisect.bisect_left(column, position.y)
+            above = below - 1
+            while below < len(column) or above >= 0:
+                if above < 0 or (below < len(column) and column[below] - position.y < position.y - column[above]):
+                    y = column[below]
+                    below += 1
+                else:
+                    y = column[above]
+                    above -= 1
+                candidate = (column_cost + abs(y - position.y), y, x)
+                if len(best) == count and candidate > best[-1]:
+                    break
+                bisect.insort(best, candidate)
+                del best[count:]
+        return [self.game_map.cell(y * self.game_map.width + x) for _, y, x in best]
+
+
 class GameMap:
+    '''
+    Карта хранится по столбцам свойств: отдельный плоский массив на каждое
+    свойство клетки, индекс y * width + x. Cell - только вид на эти массивы.
+    '''
     def __init__(self, width: int, height: int):
         self.width = width
         self.height = height
-        self.field = [[Cell(Point(j, i), None, False) for j in range(width)] for i in range(height)]
-        self.__cells = None
+        size = width * height
+        self.points: list[Point] = [Point(index % width, index // width) for index in range(size)]
+        self.bind_points()
+        # Соседи по DIRECTIONS (включая саму клетку), только внутри карты
+        self.neighbours: list[list[Point]] = [[point + direction for direction in DIRECTIONS if self.is_valid(point + direction)]
+                                              for point in self.points]
+        self.ore: array = array('h', [UNKNOWN_ORE]) * size
+        self.previous_ore: array = array('h', [UNKNOWN_ORE]) * size
+        self.predicted_ore: array = array('h', [UNKNOWN_ORE]) * size
+        # Последнее, что прислал судья, без наших правок по ходу хода
+        self.reported_ore: array = array('h', [UNKNOWN_ORE]) * size
+        self.hole: bytearray = bytearray(size)
+        self.previous_hole: bytearray = bytearray(size)
+        self.ally_radar: bytearray = bytearray(size)
+        self.destroyed_enemy_radar: bytearray = bytearray(size)
+        # Сколько неразведанных клеток накроет радар, поставленный в клетку
+        self.radar_exploration_scores: array = array('i', [0]) * size
+        self.add_radar_coverage(self.points, 1)
+        self.changes: MapChanges = MapChanges()
+        self.__views: list[Cell | None] = [None] * size
+        self.__cells: list[Cell] | None = None
     
-    def update_map(self, inputs: list[str]):
+    def neighbours_of(self, position: Point) -> list[Point]:
+        # У точек вне карты (мёртвые роботы в (-1, -1)) индекса нет
+        if position.index < 0:
+            return []
+        return self.neighbours[position.index]
+
+    def bind_points(self):
+        # Индексы от прежней карты другого размера больше не годятся
+        for point in Point._interned.values():
+            object.__setattr__(point, "index", -1)
+        for index, point in enumerate(self.points):
+            object.__setattr__(point, "index", index)
+        Point.distances = [[abs(point.x - other.x) + abs(point.y - other.y) for other in self.points] for point in self.points]
+
+    def update_map(self, tokens: list[bytes]) -> MapChanges:
+        '''
+        tokens - строки карты подряд: руда ("?" если не видно) и яма для каждой клетки.
+        '''
+        changes = MapChanges()
+        ore = self.ore
+        reported_ore = self.reported_ore
+        hole = self.hole
+        # Всё, что было до этого хода, становится предыдущим
+        self.previous_ore[:] = ore
+        self.previous_hole[:] = hole
+        self.ally_radar[:] = bytes(len(hole)) # Детектим в контроллере
         for i in range(self.height):
-            line = inputs[i].split()
-            for j in range(self.width):
-                ore =  line[2 * j]
-                if ore == '?':
-                    ore = None # unknown
-                else:
-                    ore = int(ore)
-                cell = self.field[i][j]
-                cell.ore = ore
-                cell.hole = bool(int(line[2 * j + 1]))
-                cell.ally_radar = False # Детектим в контроллере
+            index = i * self.width
+            for j in range(2 * index, 2 * (index + self.width), 2):
+                token = tokens[j]
+                new_ore = UNKNOWN_ORE if token == b'?' else int(token)
+                old_ore = ore[index]
+                if old_ore == UNKNOWN_ORE:
+                    if new_ore != UNKNOWN_ORE:
+                        changes.revealed.append(self.cell(index))
+                elif new_ore != UNKNOWN_ORE and new_ore < old_ore:
+                    changes.ore_decreased.append(self.cell(index))
+                if new_ore != reported_ore[index]:
+                    reported_ore[index] = new_ore
+                    changes.ore_changed.append(self.cell(index))
+                ore[index] = new_ore
+                new_hole = tokens[j + 1] == b'1'
+                if new_hole and not hole[index]:
+                    changes.new_holes.append(self.cell(index))
+                hole[index] = new_hole
+                index += 1
+        self.predicted_ore[:] = ore
+        self.changes = changes
+        return changes
     
+    def add_radar_coverage(self, positions: list[Point], delta: int):
+        '''
+        Добавляет delta ко всем клеткам в ромбе радиуса RADAR_RANGE вокруг
+        каждой из positions. Вместо обхода ромба кладём по две отметки
+        на строку в разностный массив и потом проходим префиксными суммами
+        только по затронутым строкам.
+        '''
+        width = self.width
+        rows: dict[int, list[int]] = {}
+        for position in positions:
+            for ydiff in range(-RADAR_RANGE, RADAR_RANGE + 1):
+                y = position.y + ydiff
+                if y < 0 or y >= self.height:
+                    continue
+                max_xdiff = RADAR_RANGE - abs(ydiff)
+                row = rows.get(y)
+                if row is None:
+                    row = rows[y] = [0] * (width + 1)
+                row[max(position.x - max_xdiff, 0)] += delta
+                row[min(position.x + max_xdiff + 1, width)] -= delta
+        scores = self.radar_exploration_scores
+        for y, row in rows.items():
+            offset = y * width
+            running = 0
+            for x in range(width):
+                running += row[x]
+                if running:
+                    scores[offset + x] += running
+
+    def index(self, position: Point) -> int:
+        return position.y * self.width + position.x
+
     def is_valid(self, position: Point) -> bool:
         return position.x >= 0 and position.y >= 0 and position.y < self.height and position.x < self.width
     
+    def cell(self, index: int) -> Cell:
+        view = self.__views[index]
+        if view is None:
+            view = self.__views[index] = Cell(self, index)
+        return view
+
     def __getitem__(self, point: Point):
         if isinstance(point, Point):
             if not self.is_valid(point):
                 raise IndexError("Out of bounds")
-            return self.field[point.y][point.x]
+            return self.cell(point.y * self.width + point.x)
         else:
             raise TypeError("Invalid indexation")
     
     @property
     def cells(self) -> list[Cell]:
+        # Все виды сразу нужны только для полных проходов по карте
         if not self.__cells:
-            self.__cells = [item for sublist in self.field for item in sublist]
+            self.__cells = [self.cell(index) for index in range(len(self.points))]
         return self.__cells
 
 class GameState:
@@ -193,17 +866,24 @@ class GameState:
         self.trap_cooldown: int = 0
         self.ally_radars: list[Point] = []
         self.ally_traps: list[Point] = []
+        self.robot_index: RobotIndex = RobotIndex(width, height)
         self.turn = 0
 
 
+    @profiler.profile()
     def update_state(self):
         self.ally_radars = []
         self.ally_traps = []
-        self.ally_score, self.enemy_score = [int(i) for i in input().split()]
-        self.game_map.update_map([input() for _ in range(self.height)])
-        entity_count, self.radar_cooldown, self.trap_cooldown = [int(i) for i in input().split()]
-        for i in range(entity_count):
-            entity_id, entity_type, x, y, item = [int(j) for j in input().split()]
+        self.ally_score, self.enemy_score = reader.read_ints(2)
+        map_tokens = []
+        for _ in range(self.height):
+            # По строке за чтение, чтобы запись хранила неизменные строки пустыми
+            map_tokens += reader.read_tokens(2 * self.width)
+        self.game_map.update_map(map_tokens)
+        entity_count, self.radar_cooldown, self.trap_cooldown = reader.read_ints(3)
+        entities = reader.read_ints(5 * entity_count)
+        for i in range(0, 5 * entity_count, 5):
+            entity_id, entity_type, x, y, item = entities[i:i + 5]
             if entity_type in [0, 1]:
                 if self.turn == 0:
                     robot = Robot(entity_id, Team(entity_type), Point(x, y), Item(item))
@@ -217,10 +897,11 @@ class GameState:
                     self.robots[entity_id].inventory = Item(item)
             elif entity_type == 2:
                 self.ally_radars.append(Point(x, y))
-                self.game_map[Point(x, y)].ally_radar = True
+                self.game_map.ally_radar[y * self.width + x] = True
             elif entity_type == 3:
                 self.ally_traps.append(Point(x, y))
         
+        self.robot_index.rebuild(list(self.robots.values()))
         self.turn += 1
 
 class Controller:
@@ -231,6 +912,14 @@ class Controller:
         self.potential_enemy_radars = []
         self.enemy_radar_cooldown: int = 0 # predicted
         self.enemies_with_equip = []
+        self.ore_index: OreIndex = OreIndex(game_state.game_map)
+        # Клетки, которые стали опасными с прошлого подсчёта руды
+        self.danger_changes: list[Point] = []
+        # Шахтёры, которым руду раздадим все вместе в assign_miners
+        self.pending_miners: list[Robot] = []
+        # Не зависящая от робота часть оценки радара, считается раз в ход
+        self.radar_scores: list[float] = []
+        self.radar_heap: list[tuple[float, int]] = []
     
     @property
     def game_map(self) -> GameMap:
@@ -244,6 +933,7 @@ class Controller:
     def enemy_robots(self) -> list[Robot]:
         return self.game_state.enemy_robots
     
+    @profiler.profile()
     def game_step(self):
         self.game_state.update_state()
         self.enemy_radar_cooldown = max(self.enemy_radar_cooldown - 1, 0)
@@ -255,13 +945,20 @@ class Controller:
         self.calculate_radar_exploration_scores()
         self.calculate_visible_ore()
         self.detect_enemy_radars()
-        print(self.calculate_radar_position_score(self.ally_robots[0], Point(8, 4)), self.calculate_radar_position_score(self.ally_robots[0], Point(12, 5)), file=sys.stderr, flush=True)
+        self.calculate_radar_scores()
         
+        self.pending_miners = []
         for robot in self.ally_robots:
             # Не тратим вычислительное время на мёртвых роботов
             # Пусть лосося поют
             if robot.is_alive:
+                if scheduler.expired():
+                    # Постоять ход дешевле, чем проиграть по времени
+                    scheduler.skip(f"робота {robot.id}")
+                    robot.WAIT("Не успел подумать")
+                    continue
                 self.decide_robot_action(robot)
+        self.assign_miners()
 
         # Указываем в любом порядке, act ТОЛЬКО по порядку.
         for robot in self.ally_robots:
@@ -292,13 +989,11 @@ class Controller:
         for holder in self.enemies_with_equip:
             if holder.previous_position:
                 if holder.previous_position == holder.position and holder.position.x != 0:
-                    for direction in DIRECTIONS:
-                        position = holder.position + direction
-                        if self.game_map.is_valid(position):
-                            cell = self.game_map[position]
-                            if cell.hole and not cell.previous_hole and not position in self.potential_enemy_radars:
-                                self.potential_enemy_radars.append(position)
-                                holder.radar_holder_cooldown = 5
+                    for position in self.game_map.neighbours_of(holder.position):
+                        cell = self.game_map[position]
+                        if cell.hole and not cell.previous_hole and not position in self.potential_enemy_radars:
+                            self.potential_enemy_radars.append(position)
+                            holder.radar_holder_cooldown = 5
                     if holder.radar_holder_cooldown > 0:
                         holder.holding_equip = False
                         self.enemies_with_equip.remove(holder)
@@ -308,79 +1003,132 @@ class Controller:
             # Если "ничего не поставил", "просто постояв на месте", то чекаем даже существующие ямы
             if holder.previous_position:
                 if holder.previous_position == holder.position and holder.position.x != 0:
-                    for direction in DIRECTIONS:
-                        position = holder.previous_position + direction
-                        if self.game_map.is_valid(position):
-                            cell = self.game_map[position]
-                            if cell.hole and not position in self.potential_enemy_radars:
-                                self.potential_enemy_radars.append(position)
-                                holder.radar_holder_cooldown = 5
+                    for position in self.game_map.neighbours_of(holder.previous_position):
+                        cell = self.game_map[position]
+                        if cell.hole and not position in self.potential_enemy_radars:
+                            self.potential_enemy_radars.append(position)
+                            holder.radar_holder_cooldown = 5
         
+    @profiler.profile()
     def detect_dangerous_cells(self):
-        for cell in self.game_map.cells:
-            if (cell.hole and not cell.previous_hole) or (cell.ore is not None and cell.previous_ore is not None and cell.ore < cell.previous_ore):
-                nearby_enemies = 0
-                for enemy in self.enemy_robots:
-                    if enemy.position - cell.position <= 1:
-                        nearby_enemies += 1
-                        break
-                if nearby_enemies > 0 and not cell.destroyed_enemy_radar:
-                    self.dangerous_cells.add(cell.position)
+        if FULL_RESCAN:
+            candidates = [cell for cell in self.game_map.cells if (cell.hole and not cell.previous_hole) or (cell.ore is not None and cell.previous_ore is not None and cell.ore < cell.previous_ore)]
+        else:
+            changes = self.game_map.changes
+            candidates = changes.new_holes + changes.ore_decreased
+        robot_index = self.game_state.robot_index
+        for cell in candidates:
+            if robot_index.has_robot_within(cell.position, 1, Team.ENEMY) and not cell.destroyed_enemy_radar and not cell.position in self.dangerous_cells:
+                self.dangerous_cells.add(cell.position)
+                self.danger_changes.append(cell.position)
     
+    @profiler.profile()
     def calculate_visible_ore(self):
-        self.visible_ore = 0
-        for cell in self.game_map.cells:
-            if cell.ore and not cell.position in self.dangerous_cells:
-                self.visible_ore += cell.ore
+        if FULL_RESCAN:
+            cells = self.game_map.cells
+        else:
+            # Только клетки, где поменялась руда или опасность
+            cells = self.game_map.changes.ore_changed + [self.game_map[position] for position in self.danger_changes]
+        self.danger_changes = []
+        self.ore_index.sync(cells, self.dangerous_cells)
+        self.visible_ore = self.ore_index.visible_ore
     
+    @profiler.profile()
     def calculate_radar_exploration_scores(self):
+        # Сетка уже построена в GameMap, на первом ходу вычитать нечего
         if self.game_state.turn == 1:
-            for cell in self.game_map.cells:
-                for xdiff in range(-4, 5):
-                    max_ydiff = 4 - abs(xdiff)
-                    for ydiff in range(-max_ydiff, max_ydiff + 1):
-                        neighbor = cell.position + Point(xdiff, ydiff)
-                        if self.game_map.is_valid(neighbor):
-                            self.game_map[neighbor].radar_exploration_score += 1
+            return
+        if FULL_RESCAN:
+            revealed = [cell.position for cell in self.game_map.cells if cell.previous_ore is None and cell.ore is not None]
         else:
-            for cell in self.game_map.cells:
-                if cell.previous_ore is None and cell.ore is not None:
-                    for xdiff in range(-4, 5):
-                        max_ydiff = 4 - abs(xdiff)
-                        for ydiff in range(-max_ydiff, max_ydiff + 1):
-                            neighbor = cell.position + Point(xdiff, ydiff)
-                            if self.game_map.is_valid(neighbor):
-                                self.game_map[neighbor].radar_exploration_score -= 1
-                        
+            revealed = [cell.position for cell in self.game_map.changes.revealed]
+        if revealed:
+            self.game_map.add_radar_coverage(revealed, -1)
 
-    
-    def calculate_radar_position_score(self, robot: Robot, position: Point) -> float:
-        EXPLORATION_BONUS = 1
-        ORE_BONUS = 10
-        ENEMY_RADAR_BONUS = 1
-        TRAP_BONUS = -1000
-        DISTANCE_COEFF = 0.01
-        TIME_DECAY_COEFF = 0.003
+    def calculate_radar_base_score(self, position: Point) -> float:
+        # Всё, кроме расстояния до робота
         # Проблема: почему-то иногда ставит радар на подозрительные клетки
-
-        if self.game_map[position].destroyed_enemy_radar:
-            EXPLORATION_BONUS += ENEMY_RADAR_BONUS
+        cell = self.game_map[position]
+        exploration_bonus = EXPLORATION_BONUS
+        if cell.destroyed_enemy_radar:
+            exploration_bonus += ENEMY_RADAR_BONUS
 
         score: float = 0
-        score += self.game_map[position].radar_exploration_score * EXPLORATION_BONUS * (1 - DISTANCE_COEFF * position.x * (1 - self.game_state.turn * TIME_DECAY_COEFF))
-        if self.game_map[position].has_ore:
-            score += ORE_BONUS * (1 - DISTANCE_COEFF * (robot.position - position))
+        score += self.game_map.radar_exploration_scores[self.game_map.index(position)] * exploration_bonus * (1 - DISTANCE_COEFF * position.x * (1 - self.game_state.turn * TIME_DECAY_COEFF))
+        if cell.has_ore:
+            score += ORE_BONUS
         if position in self.dangerous_cells:
             score += TRAP_BONUS
-        
+
         return score
-    
+
+    def calculate_radar_position_score(self, robot: Robot, position: Point) -> float:
+        score = self.calculate_radar_base_score(position)
+        # Поправка на расстояние до робота: только уменьшает оценку
+        if self.game_map[position].has_ore:
+            score -= ORE_BONUS * DISTANCE_COEFF * (robot.position - position)
+        return score
+
+    @profiler.profile()
+    def calculate_radar_scores(self):
+        # То же, что calculate_radar_base_score, но сразу по массивам карты
+        game_map = self.game_map
+        time_decay = 1 - self.game_state.turn * TIME_DECAY_COEFF
+        dangerous = bytearray(len(game_map.points))
+        for position in self.dangerous_cells:
+            dangerous[game_map.index(position)] = True
+        self.radar_scores = [
+            exploration * (EXPLORATION_BONUS + ENEMY_RADAR_BONUS * destroyed) * (1 - DISTANCE_COEFF * point.x * time_decay)
+            + (ORE_BONUS if predicted_ore > 0 else 0) + (TRAP_BONUS if is_dangerous else 0)
+            for point, exploration, destroyed, predicted_ore, is_dangerous
+            in zip(game_map.points, game_map.radar_exploration_scores, game_map.destroyed_enemy_radar, game_map.predicted_ore, dangerous)
+        ]
+        self.radar_heap = [(-score, index) for index, score in enumerate(self.radar_scores)]
+        heapq.heapify(self.radar_heap)
+
+    def cell_changed(self, position: Point):
+        # Руда/опасность клетки поменялась посреди хода
+        self.update_radar_score(position)
+        self.ore_index.update(self.game_map[position], position in self.dangerous_cells)
+
+    def update_radar_score(self, position: Point):
+        # Старая запись в куче протухнет сама: при извлечении сверяемся с radar_scores
+        index = self.game_map.index(position)
+        score = self.calculate_radar_base_score(position)
+        if score != self.radar_scores[index]:
+            self.radar_scores[index] = score
+            heapq.heappush(self.radar_heap, (-score, index))
+
+    def decide_radar_positions(self, robot: Robot, count: int) -> list[Point]:
+        '''
+        Лучшие count позиций для радара с учётом расстояния до robot.
+        Поправка на расстояние не положительна, поэтому достаём клетки из кучи
+        по убыванию базовой оценки, пока она не опустится ниже худшей из найденных.
+        '''
+        points = self.game_map.points
+        best: list[tuple[float, int]] = []  # (-оценка, индекс), при равенстве - первая по порядку клетка
+        popped = []
+        seen = set()
+        while self.radar_heap:
+            negative_score, index = self.radar_heap[0]
+            if len(best) == count and -negative_score < -best[-1][0] - 1e-9:
+                break
+            heapq.heappop(self.radar_heap)
+            if -negative_score != self.radar_scores[index] or index in seen:
+                continue
+            seen.add(index)
+            popped.append((negative_score, index))
+            bisect.insort(best, (-self.calculate_radar_position_score(robot, points[index]), index))
+            del best[count:]
+        for item in popped:
+            heapq.heappush(self.radar_heap, item)
+        return [points[index] for _, index in best]
+
     def decide_radar_position(self, robot: Robot) -> Point:
-        cells = self.game_map.cells
-        choosen_cell = max(cells, key=lambda x: self.calculate_radar_position_score(robot, x.position))
-        return choosen_cell.position
+        return self.decide_radar_positions(robot, 1)[0]
 
     
+    @profiler.profile()
     def decide_robot_action(self, robot: Robot):
         robot.is_camping = False
         if robot.role == "Hunter" and self.game_state.turn < 200:
@@ -395,6 +1143,7 @@ class Controller:
                     self.game_map[self.potential_enemy_radars[0]].destroyed_enemy_radar = True
                     if self.potential_enemy_radars[0] in self.dangerous_cells:
                         self.dangerous_cells.remove(self.potential_enemy_radars[0])
+                    self.cell_changed(self.potential_enemy_radars[0])
                     self.potential_enemy_radars.pop(0)
                 return
             elif holder:
@@ -411,6 +1160,7 @@ class Controller:
             cell = self.game_map[robot.radar_destination]
             if cell.ore:
                 cell.ore -= 1
+                self.cell_changed(robot.radar_destination)
             return
         
             
@@ -422,19 +1172,80 @@ class Controller:
             cell = self.game_map[robot.radar_destination]
             if cell.ore:
                 cell.ore -= 1
+                self.cell_changed(robot.radar_destination)
             return
         
         if self.visible_ore > 0:
-            ore_cells = [cell for cell in self.game_map.cells if cell.has_ore and not cell.position in self.dangerous_cells]
-            if ore_cells:
-                cell = min(ore_cells, key=lambda x: x.position - robot.position + x.position.x)
-                robot.DIG(cell.position, "Иду копать руду")
-                # Чтобы другие за пустой не бегали. На следующем ходу
-                # обновится правильным значением
-                if cell.predicted_ore:
-                    cell.predicted_ore -= 1
-                return
+            # Руду раздаём всем шахтёрам сразу, после остальных решений
+            self.pending_miners.append(robot)
+            return
         
+        self.decide_idle_action(robot)
+
+    @profiler.profile()
+    def assign_miners(self):
+        '''
+        Раздаёт руду всем ждущим шахтёрам сразу как задачу о назначениях:
+        стоимость - ходы до клетки, копание и ходы обратно на базу.
+        Из клетки берём не больше predicted_ore. Кому не досталось - решают,
+        чем заняться, как раньше.
+        '''
+        if not self.pending_miners:
+            return
+        start = time.perf_counter()
+        miners = self.pending_miners
+        self.pending_miners = []
+        candidates: list[Cell] = []
+        for robot in miners:
+            for cell in self.ore_index.nearest(robot.position, ASSIGNMENT_CANDIDATES):
+                if cell not in candidates:
+                    candidates.append(cell)
+        # Решение задачи стоит порядка ASSIGNMENT_TIME_BUDGET - не влезает в остаток хода, раздаём жадно
+        if time.perf_counter() - start > ASSIGNMENT_TIME_BUDGET or scheduler.time_left() < ASSIGNMENT_TIME_BUDGET:
+            self.assign_miners_greedily(miners)
+            return
+
+        # Клетку с запасом руды n можно выдать n шахтёрам. Плюс по "пустому"
+        # месту на каждого, если руды на всех не хватит
+        slots: list[Cell | None] = []
+        for cell in candidates:
+            slots += [cell] * min(cell.predicted_ore, len(miners))
+        slots += [None] * len(miners)
+        costs = [[self.calculate_mining_cost(robot, cell) for cell in slots] for robot in miners]
+        for robot, slot in zip(miners, solve_assignment(costs)):
+            cell = slots[slot]
+            if cell is None:
+                self.decide_idle_action(robot)
+            else:
+                self.dig_ore(robot, cell)
+
+    def assign_miners_greedily(self, miners: list[Robot]):
+        for robot in miners:
+            ore_cells = self.ore_index.nearest(robot.position)
+            if ore_cells:
+                self.dig_ore(robot, ore_cells[0])
+            else:
+                self.decide_idle_action(robot)
+
+    def calculate_mining_cost(self, robot: Robot, cell: Cell | None) -> int:
+        if cell is None:
+            # Дороже любой клетки на карте
+            return 1000 * (self.game_state.width + self.game_state.height)
+        distance = cell.position - robot.position
+        # Копать можно с соседней клетки, потом ход на сам DIG
+        turns = math.ceil(max(distance - 1, 0) / ROBOT_SPEED) + 1 + math.ceil(cell.position.x / ROBOT_SPEED)
+        # При равных ходах - как раньше, по расстоянию туда и обратно
+        return turns * 100 + distance + cell.position.x
+
+    def dig_ore(self, robot: Robot, cell: Cell):
+        robot.DIG(cell.position, "Иду копать руду")
+        # Чтобы другие за пустой не бегали. На следующем ходу
+        # обновится правильным значением
+        if cell.predicted_ore:
+            cell.predicted_ore -= 1
+            self.cell_changed(cell.position)
+
+    def decide_idle_action(self, robot: Robot):
         if not any([robot.is_camping for robot in self.ally_robots]):
             robot.MOVE(Point(0, robot.position.y), "Иду на базу ждать айтем")
             robot.is_camping = True
@@ -456,12 +1267,52 @@ class Controller:
             
 
 
-width, height = [int(i) for i in input().split()]
+def play():
+    reader.fill()
+    scheduler.start_turn() # Часы первого хода идут с начального ввода
+    width, height = reader.read_ints(2)
+
+    game_state = GameState(width, height)
 
-game_state = GameState(width, height)
+    controller = Controller(game_state)
+
+    # game loop
+    while True:
+        reader.fill() # Ожидание судьи не считаем
+        scheduler.start_turn()
+        with profiler.phase("turn"):
+            controller.game_step()
+            writer.flush()
+        profiler.end_turn()
+        scheduler.finish_turn()
+
+
+def replay(path: str):
+    '''
+    Прогоняет записанную игру без судьи и сверяет команды с записанными.
+    '''
+    turns = ReplayRecorder.load(path)
+    reader.stream = io.BytesIO(b"".join(b"\n".join(inputs) + b"\n" for inputs, _ in turns))
+    writer.stream = io.BytesIO()
+    reader.recorder = writer.recorder = recorder = ReplayRecorder()
+    start = time.perf_counter()
+    try:
+        play()
+    except EOFError:
+        pass
+    elapsed = time.perf_counter() - start
+    changed = [turn for turn, ((_, recorded), (_, replayed)) in enumerate(zip(turns, recorder.turns)) if recorded != replayed]
+    print(f"{len(recorder.turns)} ходов за {elapsed * 1000:.0f} мс, команды отличаются в {len(changed)}", file=sys.stderr)
+    if changed:
+        turn = changed[0]
+        print(f"Ход {turn}: было {turns[turn][1]}, стало {recorder.turns[turn][1]}", file=sys.stderr)
 
-controller = Controller(game_state)
 
-# game loop
-while True:
-    controller.game_step()
+if __name__ == "__main__":
+    # Без аргументов - обычная игра, как на CodinGame
+    if len(sys.argv) == 3 and sys.argv[1] == "--replay":
+        replay(sys.argv[2])
+    else:
+        if len(sys.argv) == 3 and sys.argv[1] == "--record":
+            reader.recorder = writer.recorder = ReplayRecorder(sys.argv[2])
+        play()
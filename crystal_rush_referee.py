@@ -0,0 +1,386 @@
+'''
+Локальный судья Crystal Rush: два бота-процесса играют друг с другом
+по тому же протоколу stdin/stdout, что и на CodinGame.
+
+    python crystal_rush_referee.py crystal_rush.py crystal_rush.py --games 200 --jobs 8
+
+Бот - путь к .py (запускается текущим питоном с -u) или произвольная команда
+в кавычках. Стороны меняются через игру, чтобы не было перекоса от порядка.
+'''
+
+from __future__ import annotations
+import os
+import sys
+import time
+import random
+import select
+import shlex
+import argparse
+import subprocess
+from multiprocessing import Pool
+
+WIDTH = 30
+HEIGHT = 15
+ROBOTS_PER_PLAYER = 5
+MAX_TURNS = 200
+ROBOT_SPEED = 4
+RADAR_RANGE = 4
+RADAR_COOLDOWN = 5
+TRAP_COOLDOWN = 5
+ORE_MIN_X = 4 # Ближе к базе руды нет
+
+FIRST_TURN_TIMEOUT = 1.0
+TURN_TIMEOUT = 0.1 # На CodinGame 50 мс, локально даём запас на загрузку машины
+
+NONE = -1
+RADAR = 2
+TRAP = 3
+ORE = 4
+
+ITEMS = {"RADAR": RADAR, "TRAP": TRAP}
+
+
+def generate_ore(rng: random.Random) -> list[int]:
+    '''
+    Руда жилами: случайные центры правее ORE_MIN_X, вокруг них клетки
+    с 1-3 рудой, чем дальше от центра - тем реже.
+    '''
+    ore = [0] * (WIDTH * HEIGHT)
+    for _ in range(rng.randint(12, 22)):
+        center_x = rng.randint(ORE_MIN_X + 1, WIDTH - 2)
+        center_y = rng.randint(1, HEIGHT - 2)
+        radius = rng.randint(1, 3)
+        for y in range(center_y - radius, center_y + radius + 1):
+            for x in range(center_x - radius, center_x + radius + 1):
+                if not (ORE_MIN_X <= x < WIDTH and 0 <= y < HEIGHT):
+                    continue
+                distance = abs(x - center_x) + abs(y - center_y)
+                if distance <= radius and rng.random() < 1 - distance / (radius + 2):
+                    ore[y * WIDTH + x] += rng.randint(1, 3)
+    return ore
+
+
+class Robot:
+    def __init__(self, robot_id: int, owner: int, x: int, y: int):
+        self.id = robot_id
+        self.owner = owner
+        self.x = x
+        self.y = y
+        self.item = NONE
+        self.alive = True
+
+    def distance(self, x: int, y: int) -> int:
+        return abs(self.x - x) + abs(self.y - y)
+
+    def move_towards(self, x: int, y: int, stop_distance: int):
+        # Сначала по x, потом по y, не больше ROBOT_SPEED шагов
+        steps = min(ROBOT_SPEED, max(self.distance(x, y) - stop_distance, 0))
+        step_x = min(steps, abs(x - self.x))
+        self.x += step_x if x > self.x else -step_x
+        steps -= step_x
+        step_y = min(steps, abs(y - self.y))
+        self.y += step_y if y > self.y else -step_y
+
+
+class Game:
+    '''
+    Состояние одной партии и разбор хода. Порядок как у настоящего судьи:
+    взрывы ловушек, копание, запросы, движение, сдача руды.
+    '''
+    def __init__(self, seed: int):
+        rng = random.Random(seed)
+        self.ore: list[int] = generate_ore(rng)
+        self.hole: list[int] = [0] * (WIDTH * HEIGHT)
+        # Закопанный предмет в клетке: (владелец, RADAR/TRAP, id сущности)
+        self.buried: dict[int, tuple[int, int, int]] = {}
+        # Сколько радаров игрока видят клетку
+        self.coverage: list[list[int]] = [[0] * (WIDTH * HEIGHT) for _ in range(2)]
+        self.next_entity_id = 2 * ROBOTS_PER_PLAYER
+        self.scores = [0, 0]
+        self.radar_cooldowns = [0, 0]
+        self.trap_cooldowns = [0, 0]
+        self.turn = 0
+        rows = rng.sample(range(HEIGHT), ROBOTS_PER_PLAYER)
+        self.robots: list[Robot] = [Robot(owner * ROBOTS_PER_PLAYER + i, owner, 0, rows[i])
+                                    for owner in range(2) for i in range(ROBOTS_PER_PLAYER)]
+
+    def robots_of(self, owner: int) -> list[Robot]:
+        return self.robots[owner * ROBOTS_PER_PLAYER:(owner + 1) * ROBOTS_PER_PLAYER]
+
+    def add_coverage(self, owner: int, index: int, delta: int):
+        center_x, center_y = index % WIDTH, index // WIDTH
+        coverage = self.coverage[owner]
+        for y in range(max(center_y - RADAR_RANGE, 0), min(center_y + RADAR_RANGE, HEIGHT - 1) + 1):
+            span = RADAR_RANGE - abs(y - center_y)
+            for x in range(max(center_x - span, 0), min(center_x + span, WIDTH - 1) + 1):
+                coverage[y * WIDTH + x] += delta
+
+    def remove_buried(self, index: int):
+        owner, item, _ = self.buried.pop(index)
+        if item == RADAR:
+            self.add_coverage(owner, index, -1)
+
+    def player_input(self, owner: int) -> str:
+        lines = [f"{self.scores[owner]} {self.scores[1 - owner]}"]
+        coverage = self.coverage[owner]
+        for y in range(HEIGHT):
+            row = []
+            for index in range(y * WIDTH, (y + 1) * WIDTH):
+                row.append(f"{self.ore[index] if coverage[index] else '?'} {self.hole[index]}")
+            lines.append(" ".join(row))
+        entities = []
+        for robot in self.robots:
+            x, y = (robot.x, robot.y) if robot.alive else (-1, -1)
+            if robot.owner == owner:
+                entities.append(f"{robot.id} 0 {x} {y} {robot.item if robot.alive else NONE}")
+            else:
+                entities.append(f"{robot.id} 1 {x} {y} {NONE}")
+        for index, (item_owner, item, entity_id) in self.buried.items():
+            if item_owner == owner:
+                entities.append(f"{entity_id} {item} {index % WIDTH} {index // WIDTH} {NONE}")
+        lines.append(f"{len(entities)} {self.radar_cooldowns[owner]} {self.trap_cooldowns[owner]}")
+        lines += entities
+        return "\n".join(lines) + "\n"
+
+    def play_turn(self, commands: list[list[str]]):
+        '''
+        commands[owner] - по строке на каждого робота игрока, по порядку id.
+        '''
+        orders: list[tuple[Robot, list[str]]] = []
+        for owner in range(2):
+            for robot, command in zip(self.robots_of(owner), commands[owner]):
+                if robot.alive:
+                    orders.append((robot, command.split()))
+
+        diggers = []
+        requests = []
+        movers = []
+        for robot, words in orders:
+            try:
+                if words[0] == "DIG":
+                    x, y = int(words[1]), int(words[2])
+                    if not (0 <= x < WIDTH and 0 <= y < HEIGHT):
+                        continue
+                    if robot.distance(x, y) <= 1:
+                        diggers.append((robot, y * WIDTH + x))
+                    else:
+                        movers.append((robot, x, y, 1))
+                elif words[0] == "MOVE":
+                    movers.append((robot, int(words[1]), int(words[2]), 0))
+                elif words[0] == "REQUEST":
+                    requests.append((robot, ITEMS[words[1]]))
+            except (IndexError, ValueError, KeyError):
+                pass # Кривая команда - считаем WAIT
+
+        self.explode_traps([index for _, index in diggers])
+
+        for robot, index in diggers:
+            if not robot.alive:
+                continue
+            self.hole[index] = 1
+            if index in self.buried and self.buried[index][0] != robot.owner:
+                # Вражеский радар выкопали
+                self.remove_buried(index)
+            if robot.item in (RADAR, TRAP):
+                if index in self.buried:
+                    self.remove_buried(index)
+                self.buried[index] = (robot.owner, robot.item, self.next_entity_id)
+                self.next_entity_id += 1
+                if robot.item == RADAR:
+                    self.add_coverage(robot.owner, index, 1)
+                robot.item = NONE
+            if robot.item == NONE and self.ore[index] > 0:
+                self.ore[index] -= 1
+                robot.item = ORE
+
+        for robot, item in requests:
+            if robot.x != 0 or not robot.alive:
+                continue
+            cooldowns = self.radar_cooldowns if item == RADAR else self.trap_cooldowns
+            if cooldowns[robot.owner] == 0:
+                robot.item = item
+                cooldowns[robot.owner] = RADAR_COOLDOWN if item == RADAR else TRAP_COOLDOWN
+
+        for robot, x, y, stop_distance in movers:
+            robot.move_towards(max(0, min(x, WIDTH - 1)), max(0, min(y, HEIGHT - 1)), stop_distance)
+
+        for robot in self.robots:
+            if robot.alive and robot.item == ORE and robot.x == 0:
+                robot.item = NONE
+                self.scores[robot.owner] += 1
+
+        for owner in range(2):
+            self.radar_cooldowns[owner] = max(self.radar_cooldowns[owner] - 1, 0)
+            self.trap_cooldowns[owner] = max(self.trap_cooldowns[owner] - 1, 0)
+        self.turn += 1
+
+    def explode_traps(self, dug: list[int]):
+        # Ловушка взрывается от копания и цепляет соседние ловушки
+        exploding = [index for index in dug if index in self.buried and self.buried[index][1] == TRAP]
+        while exploding:
+            index = exploding.pop()
+            if index not in self.buried:
+                continue
+            self.remove_buried(index)
+            x, y = index % WIDTH, index // WIDTH
+            for robot in self.robots:
+                if robot.alive and robot.distance(x, y) <= 1:
+                    robot.alive = False
+                    robot.item = NONE
+            for neighbour_x, neighbour_y in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                neighbour = neighbour_y * WIDTH + neighbour_x
+                if 0 <= neighbour_x < WIDTH and 0 <= neighbour_y < HEIGHT and neighbour in self.buried and self.buried[neighbour][1] == TRAP:
+                    exploding.append(neighbour)
+
+    @property
+    def is_over(self) -> bool:
+        if self.turn >= MAX_TURNS:
+            return True
+        if not any(robot.alive for robot in self.robots):
+            return True
+        ore_left = sum(self.ore) + sum(1 for robot in self.robots if robot.alive and robot.item == ORE)
+        return ore_left == 0
+
+
+class BotProcess:
+    '''
+    Бот в отдельном процессе. Ответ читаем сами из пайпа через select,
+    чтобы зависший бот не подвешивал судью дольше таймаута.
+    '''
+    def __init__(self, command: list[str], show_stderr: bool):
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=None if show_stderr else subprocess.DEVNULL)
+        self.buffer = b""
+        self.failed = False
+
+    def send(self, text: str):
+        try:
+            self.process.stdin.write(text.encode())
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            self.failed = True
+
+    def read_lines(self, count: int, timeout: float) -> list[str] | None:
+        deadline = time.monotonic() + timeout
+        descriptor = self.process.stdout.fileno()
+        while self.buffer.count(b"\n") < count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            ready, _, _ = select.select([descriptor], [], [], remaining)
+            if not ready:
+                return None
+            chunk = os.read(descriptor, 65536)
+            if not chunk:
+                return None
+            self.buffer += chunk
+        lines = self.buffer.split(b"\n")
+        self.buffer = b"\n".join(lines[count:])
+        return [line.decode(errors="replace").strip() for line in lines[:count]]
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.kill()
+        self.process.wait()
+
+
+def bot_command(bot: str) -> list[str]:
+    if bot.endswith(".py"):
+        return [sys.executable, "-u", bot]
+    return shlex.split(bot)
+
+
+def play_game(seed: int, bots: list[str], turn_timeout: float = TURN_TIMEOUT, show_stderr: bool = False) -> dict:
+    '''
+    Одна партия. bots[0] играет за игрока 0. Кто упал или не ответил
+    вовремя - проиграл, его роботы до конца игры стоят.
+    '''
+    game = Game(seed)
+    processes = [BotProcess(bot_command(bot), show_stderr) for bot in bots]
+    for process in processes:
+        process.send(f"{WIDTH} {HEIGHT}\n")
+    try:
+        while not game.is_over:
+            commands = []
+            for owner, process in enumerate(processes):
+                lines = None
+                if not process.failed:
+                    process.send(game.player_input(owner))
+                    timeout = FIRST_TURN_TIMEOUT if game.turn == 0 else turn_timeout
+                    lines = process.read_lines(ROBOTS_PER_PLAYER, timeout)
+                    if lines is None:
+                        process.failed = True
+                commands.append(lines or ["WAIT"] * ROBOTS_PER_PLAYER)
+            if all(process.failed for process in processes):
+                break
+            game.play_turn(commands)
+    finally:
+        for process in processes:
+            process.close()
+
+    failed = [process.failed for process in processes]
+    if failed[0] != failed[1]:
+        winner = 1 if failed[0] else 0
+    elif game.scores[0] != game.scores[1]:
+        winner = 0 if game.scores[0] > game.scores[1] else 1
+    else:
+        winner = -1
+    return {"seed": seed, "scores": game.scores, "turns": game.turn, "failed": failed, "winner": winner}
+
+
+def play_match(arguments: tuple[int, list[str], float, bool]) -> dict:
+    # Чётные сиды - первый бот за игрока 0, нечётные - наоборот
+    seed, bots, turn_timeout, show_stderr = arguments
+    swapped = seed % 2 == 1
+    result = play_game(seed, bots[::-1] if swapped else bots, turn_timeout, show_stderr)
+    if swapped:
+        result["scores"] = result["scores"][::-1]
+        result["failed"] = result["failed"][::-1]
+        if result["winner"] != -1:
+            result["winner"] = 1 - result["winner"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Crystal Rush referee")
+    parser.add_argument("bot1")
+    parser.add_argument("bot2")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game, the rest follow")
+    parser.add_argument("--turn-timeout", type=float, default=TURN_TIMEOUT)
+    parser.add_argument("--show-stderr", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="print every game")
+    args = parser.parse_args()
+
+    bots = [args.bot1, args.bot2]
+    tasks = [(args.seed + i, bots, args.turn_timeout, args.show_stderr) for i in range(args.games)]
+    wins = [0, 0]
+    draws = 0
+    failures = [0, 0]
+    total_scores = [0, 0]
+    start = time.perf_counter()
+    with Pool(args.jobs) as pool:
+        for result in pool.imap_unordered(play_match, tasks):
+            if args.verbose:
+                print(f"seed {result['seed']}: {result['scores'][0]} - {result['scores'][1]} in {result['turns']} turns"
+                      + (f", failed {result['failed']}" if any(result["failed"]) else ""))
+            if result["winner"] == -1:
+                draws += 1
+            else:
+                wins[result["winner"]] += 1
+            for i in range(2):
+                total_scores[i] += result["scores"][i]
+                failures[i] += result["failed"][i]
+    elapsed = time.perf_counter() - start
+
+    for i in range(2):
+        print(f"{bots[i]}: {wins[i]} wins, average score {total_scores[i] / args.games:.2f}, {failures[i]} failures")
+    print(f"{draws} draws, {args.games} games in {elapsed:.1f}s ({args.games / elapsed * 60:.0f} games/min)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Replay benchmark for both bots: feeds recorded games (see --record in the bots) to a bot in-process,
+times its decision entry points on every turn and counts the turns whose commands changed.
+
+    python replay_benchmark.py --record-games 20 --bot soak_overflow.py --out replays/soak
+    python replay_benchmark.py replays/soak
+    python replay_benchmark.py replays/soak --bot soak_overflow.py --baseline /tmp/soak_overflow_old.py --unlimited
+
+By default the commands are compared with the ones stored in the recordings; --baseline replays another
+version of the bot instead. --unlimited lifts the turn clock and time budgets, so decisions no longer depend
+on the machine's speed and any change in the commands comes from the code.
+Bots are driven through their play(), so a baseline has to be a version that has it.
+"""
+
+import io
+import os
+import sys
+import math
+import time
+import shlex
+import argparse
+import functools
+import importlib
+import importlib.util
+from contextlib import redirect_stderr, nullcontext
+from multiprocessing import Pool
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Recording magic: bot, referee, timed entry points
+GAMES = {
+    b"CRR1": ("crystal_rush.py", "crystal_rush_referee.py",
+              ["GameState.update_state", "Controller.game_step", "Controller.decide_robot_action", "Controller.assign_miners"]),
+    b"SOR1": ("soak_overflow.py", "soak_overflow_referee.py",
+              ["GameState.update_turn_input", "Strategy.get_actions_for_agent", "JointActionSearch.search"]),
+}
+TIME_BUDGETS = ["ASSIGNMENT_TIME_BUDGET", "SEARCH_TIME_BUDGET"]  # Whichever the bot has
+PERCENTILES = [50, 90, 99]
+SHOWN_CHANGES = 5
+
+
+def load_module(path, name):
+    # A fresh copy per game: the bots keep their reader, writer, clock and random seed at module level
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def get_game(path):
+    with open(path, "rb") as file:
+        magic = file.read(4)
+    if magic not in GAMES:
+        raise ValueError(f"{path} is not a recording")
+    return magic
+
+
+def find_recordings(paths):
+    recordings = []
+    for path in paths:
+        if os.path.isdir(path):
+            recordings += sorted(os.path.join(path, name) for name in os.listdir(path) if not name.startswith("."))
+        else:
+            recordings.append(path)
+    return recordings
+
+
+def timed(method, samples):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper
+
+
+def replay_game(bot, turns, entry_points, unlimited, show_stderr):
+    """
+    Plays the recorded inputs through the bot and returns (commands per turn, {entry point: seconds per call}).
+    The "turn" entry is the time between two flushes, which in a replay is the whole turn including parsing.
+    """
+    module = load_module(bot, f"replayed_bot_{os.getpid()}")
+    samples = {"turn": []}
+    for entry_point in entry_points:
+        class_name, method_name = entry_point.split(".")
+        cls = getattr(module, class_name)
+        samples[entry_point] = []
+        setattr(cls, method_name, timed(getattr(cls, method_name), samples[entry_point]))
+    if unlimited:
+        module.scheduler.time_limit = module.scheduler.first_time_limit = math.inf
+        for name in TIME_BUDGETS:
+            if hasattr(module, name):
+                setattr(module, name, math.inf)
+
+    recorder = module.ReplayRecorder()
+    flush = module.writer.flush
+    last_flush = None
+
+    def timed_flush():
+        nonlocal last_flush
+        flush()
+        now = time.perf_counter()
+        samples["turn"].append(now - last_flush)
+        last_flush = now
+
+    module.reader.stream = io.BytesIO(b"".join(b"\n".join(inputs) + b"\n" for inputs, _ in turns))
+    module.writer.stream = io.BytesIO()
+    module.reader.recorder = module.writer.recorder = recorder
+    module.writer.flush = timed_flush
+    with nullcontext() if show_stderr else redirect_stderr(io.StringIO()):
+        last_flush = time.perf_counter()
+        try:
+            module.play()
+        except EOFError:
+            pass
+    return [[line.decode() for line in outputs] for _, outputs in recorder.turns], samples
+
+
+def benchmark_recording(arguments):
+    path, bot, baseline, extra_entry_points, unlimited, show_stderr = arguments
+    magic = get_game(path)
+    default_bot, _, entry_points = GAMES[magic]
+    bot = bot or os.path.join(HERE, default_bot)
+    turns = load_module(bot, f"loader_{os.getpid()}").ReplayRecorder.load(path)
+    commands, samples = replay_game(bot, turns, entry_points + extra_entry_points, unlimited, show_stderr)
+    if baseline:
+        expected, _ = replay_game(baseline, turns, [], unlimited, show_stderr)
+    else:
+        expected = [[line.decode() for line in outputs] for _, outputs in turns]
+    changes = []  # (turn, [(expected line, new line) that differ])
+    for turn, (before, after) in enumerate(zip(expected, commands)):
+        if before != after:
+            lines = [(old, new) for old, new in zip(before, after) if old != new]
+            lines += [(old, None) for old in before[len(after):]] + [(None, new) for new in after[len(before):]]
+            changes.append((turn, lines))
+    if len(commands) != len(expected):
+        changes.append((min(len(commands), len(expected)), [(f"{len(expected)} turns", f"{len(commands)} turns")]))
+    return {"path": path, "turns": len(commands), "samples": samples, "changes": changes}
+
+
+def percentile(values, p):
+    # Nearest rank on sorted values
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def print_report(results):
+    samples = {}
+    for result in results:
+        for entry_point, values in result["samples"].items():
+            samples.setdefault(entry_point, []).extend(values)
+    turns = sum(result["turns"] for result in results)
+    changed = sum(len(result["changes"]) for result in results)
+    changed_lines = sum(len(lines) for result in results for _, lines in result["changes"])
+
+    header = f"{'entry point':<34}{'calls':>8}{'mean':>9}" + "".join(f"{f'p{p}':>9}" for p in PERCENTILES) + f"{'max':>9}"
+    print(header)
+    for entry_point, values in samples.items():
+        if not values:
+            continue
+        values.sort()
+        row = [sum(values) / len(values)] + [percentile(values, p) for p in PERCENTILES] + [values[-1]]
+        print(f"{entry_point:<34}{len(values):>8}" + "".join(f"{value * 1000:>9.3f}" for value in row))
+    print("(milliseconds)")
+
+    print(f"{len(results)} games, {turns} turns, {changed_lines} commands changed in {changed} turns")
+    shown = 0
+    for result in results:
+        for turn, lines in result["changes"]:
+            if shown == SHOWN_CHANGES:
+                return
+            print(f"  {os.path.basename(result['path'])} turn {turn}:")
+            for old, new in lines:
+                print(f"    {old} -> {new}")
+            shown += 1
+
+
+def record_games(games, bot, out, seed, jobs):
+    """
+    Builds a corpus: the bot plays itself under the local referee with both sides recording.
+    """
+    magic = next(magic for magic, (name, _, _) in GAMES.items() if os.path.basename(bot) == name)
+    referee = importlib.import_module(os.path.splitext(GAMES[magic][1])[0])  # Imported by name so Pool can pickle play_match
+    os.makedirs(out, exist_ok=True)
+    matches = []
+    for game in range(seed, seed + games):
+        bots = [f"{shlex.quote(sys.executable)} -u {shlex.quote(bot)} --record "
+                f"{shlex.quote(os.path.join(out, f'{game}_{player}.replay'))}" for player in range(2)]
+        matches.append((game, bots, referee.TURN_TIMEOUT, False))
+    with Pool(jobs) as pool:
+        for result in pool.imap_unordered(referee.play_match, matches):
+            print(f"game {result['seed']}: {result['turns']} turns, scores {result['scores']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay benchmark for the bots")
+    parser.add_argument("recordings", nargs="*", help="recordings or directories of them")
+    parser.add_argument("--bot", help="bot to benchmark, by default the one the recordings come from")
+    parser.add_argument("--baseline", help="bot whose commands to compare with instead of the recorded ones")
+    parser.add_argument("--entry", action="append", default=[], metavar="CLASS.METHOD", help="also time this method")
+    parser.add_argument("--unlimited", action="store_true", help="no turn clock or time budgets, deterministic decisions")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--show-stderr", action="store_true")
+    parser.add_argument("--record-games", type=int, metavar="GAMES", help="record a corpus with --bot and --out and exit")
+    parser.add_argument("--out", default="replays")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first recorded game, the rest follow")
+    args = parser.parse_args()
+
+    if args.record_games:
+        if not args.bot:
+            parser.error("--record-games needs --bot")
+        record_games(args.record_games, os.path.abspath(args.bot), args.out, args.seed, args.jobs)
+        return
+    recordings = find_recordings(args.recordings)
+    if not recordings:
+        parser.error("no recordings given")
+
+    bot = args.bot and os.path.abspath(args.bot)
+    baseline = args.baseline and os.path.abspath(args.baseline)
+    tasks = [(path, bot, baseline, args.entry, args.unlimited, args.show_stderr) for path in recordings]
+    start = time.perf_counter()
+    # Timings are more honest one game at a time, --jobs 1 for anything close
+    with Pool(args.jobs) as pool:
+        results = pool.map(benchmark_recording, tasks)
+    print_report(results)
+    print(f"{time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,15 +5,200 @@ import math
 from abc import ABC, abstractmethod
 import random
 import time
+import heapq
+import functools
+import io
+import zlib
 from collections import deque
+from contextlib import contextmanager, nullcontext
 
 random.seed(42)
 
-class Point:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
 
+class InputReader:
+    """
+    Reads stdin in chunks instead of one input() per line: one split() per chunk, then just an index.
+    read1 returns whatever the referee has sent so far, so it never waits for the next turn.
+    """
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdin.buffer
+        self.tokens = []
+        self.position = 0
+        self.partial = b""  # End of a chunk cut in the middle of a token
+        self.recorder = None
+
+    def fill(self):
+        while self.position >= len(self.tokens):
+            chunk = self.stream.read1(1 << 16)
+            if not chunk:
+                if not self.partial:
+                    raise EOFError("EOF when reading a token")
+                self.tokens, self.position, self.partial = [self.partial], 0, b""
+                return
+            data = self.partial + chunk
+            self.tokens = data.split()
+            self.position = 0
+            self.partial = b""
+            if self.tokens and not data[-1:].isspace():
+                self.partial = self.tokens.pop()
+
+    def read_tokens(self, count):
+        result = []
+        while len(result) < count:
+            self.fill()
+            taken = self.tokens[self.position:self.position + count - len(result)]
+            self.position += len(taken)
+            result += taken
+        if self.recorder is not None:
+            self.recorder.add_input(result)
+        return result
+
+    def read_ints(self, count):
+        return list(map(int, self.read_tokens(count)))
+
+    def read_int(self):
+        return int(self.read_tokens(1)[0])
+
+
+class CommandWriter:
+    """
+    Collects the turn's command lines and sends them in one write and flush.
+    """
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout.buffer
+        self.lines = []
+        self.recorder = None
+
+    def write(self, line):
+        self.lines.append(line)
+
+    def flush(self):
+        # Commands go out once per turn, so this is also the recorder's turn boundary
+        if self.recorder is not None:
+            self.recorder.end_turn(self.lines)
+        if self.lines:
+            self.stream.write(("\n".join(self.lines) + "\n").encode())
+            self.lines.clear()
+        self.stream.flush()
+
+
+class ReplayRecorder:
+    """
+    Records everything the bot reads (one line per read call) and the commands of every turn.
+    A line equal to the same line of the previous turn costs a single zero byte, so unchanged map rows are nearly free.
+    Lengths are varints, the stream is zlib-compressed and synced every turn because the referee kills us at the end.
+    """
+    MAGIC = b"SOR1"
+
+    def __init__(self, path=None):
+        self.file = open(path, "wb") if path else None
+        if self.file:
+            self.file.write(self.MAGIC)
+        self.compressor = zlib.compressobj(9)
+        self.inputs = []
+        self.previous = ([], [])
+        self.turns = []  # (input lines, command lines)
+
+    def add_input(self, tokens):
+        self.inputs.append(b" ".join(tokens))
+
+    def end_turn(self, commands):
+        outputs = [command.encode() for command in commands]
+        if self.file:
+            record = bytearray()
+            self.encode_lines(record, self.inputs, self.previous[0])
+            self.encode_lines(record, outputs, self.previous[1])
+            self.file.write(self.compressor.compress(bytes(record)) + self.compressor.flush(zlib.Z_SYNC_FLUSH))
+            self.file.flush()
+        self.turns.append((self.inputs, outputs))
+        self.previous = (self.inputs, outputs)
+        self.inputs = []
+
+    @staticmethod
+    def encode_lines(record, lines, previous):
+        ReplayRecorder.write_varint(record, len(lines))
+        for i, line in enumerate(lines):
+            if i < len(previous) and previous[i] == line:
+                record.append(0)
+            else:
+                ReplayRecorder.write_varint(record, len(line) + 1)
+                record += line
+
+    @staticmethod
+    def decode_lines(data, position, previous):
+        count, position = ReplayRecorder.read_varint(data, position)
+        lines = []
+        for i in range(count):
+            length, position = ReplayRecorder.read_varint(data, position)
+            if length == 0:
+                lines.append(previous[i])
+            else:
+                lines.append(data[position:position + length - 1])
+                position += length - 1
+        return lines, position
+
+    @staticmethod
+    def write_varint(record, value):
+        while value >= 0x80:
+            record.append(value & 0x7F | 0x80)
+            value >>= 7
+        record.append(value)
+
+    @staticmethod
+    def read_varint(data, position):
+        value = 0
+        shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value, position
+            shift += 7
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as file:
+            data = file.read()
+        if data[:len(ReplayRecorder.MAGIC)] != ReplayRecorder.MAGIC:
+            raise ValueError(f"{path} is not a Soak Overflow recording")
+        data = zlib.decompressobj().decompress(data[len(ReplayRecorder.MAGIC):])
+        turns = []
+        previous = ([], [])
+        position = 0
+        while position < len(data):
+            inputs, position = ReplayRecorder.decode_lines(data, position, previous[0])
+            outputs, position = ReplayRecorder.decode_lines(data, position, previous[1])
+            previous = (inputs, outputs)
+            turns.append(previous)
+        return turns
+
+
+reader = InputReader()
+writer = CommandWriter()
+
+class Point:
+    """
+    Immutable and interned: Point(x, y) always returns the same object, so hot loops
+    don't allocate and points can be used in sets and as dict keys.
+    GameMap gives its tiles an index, which turns distances into table lookups.
+    """
+    __slots__ = ("x", "y", "index")
+    _interned = {}
+    distances = []  # Manhattan distance between map tiles, by index
+
+    def __new__(cls, x, y):
+        point = cls._interned.get((x, y))
+        if point is None:
+            point = object.__new__(cls)
+            object.__setattr__(point, "x", x)
+            object.__setattr__(point, "y", y)
+            object.__setattr__(point, "index", -1)  # Outside of the map
+            cls._interned[(x, y)] = point
+        return point
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Point is immutable")
 
     def __add__(self, other):
         if isinstance(other, Point):
@@ -22,12 +207,14 @@ class Point:
             return Point(self.x + other[0], self.y + other[1])
 
     def __sub__(self, other):
+        if self.index >= 0 and other.index >= 0:
+            return Point.distances[self.index][other.index]
         return abs(self.x - other.x) + abs(self.y - other.y)
 
     def __eq__(self, other):
-        if isinstance(other, Point):
-            return self.x == other.x and self.y == other.y
-        return False
+        return self is other
+
+    __hash__ = object.__hash__
 
     def __str__(self):
         return f"(X:{self.x}; Y:{self.y})"
@@ -36,7 +223,7 @@ class Point:
         return f"(X:{self.x}; Y:{self.y})"
 
     def copy(self):
-        return Point(self.x, self.y)
+        return self
 
 def MOVE(point: Point) -> str:
     return f"MOVE {point.x} {point.y}"
@@ -64,6 +251,176 @@ STAY_AWAY_DISTANCE = 2
 
 THROW_DISTANCE = 4
 
+PATH_BLOCKED = 29  # Step cost of a tile that can't be entered; lower ones cost 1 + priority
+
+# Joint action search, replaces the per-agent strategies when enabled
+SEARCH_ENABLED = False
+SEARCH_TIME_BUDGET = 0.04  # Seconds per turn, leaves some of the 50ms for input and output
+SEARCH_MIN_TIME = 0.005  # Seconds left on the turn clock below which the search isn't even set up
+SEARCH_MAX_BEAM_WIDTH = 64
+SEARCH_THROW_CANDIDATES = 3
+SEARCH_KILL_BONUS = 50
+SEARCH_TERRITORY_WEIGHT = 2
+SEARCH_FIREPOWER_WEIGHT = 1  # Per point of damage the agent could deal next turn from where it ends up
+SEARCH_STRATEGY_MOVE_BONUS = 10  # For following the long-term move of the agent's strategy
+
+TURN_TIME_LIMIT = 0.05  # Seconds
+FIRST_TURN_TIME_LIMIT = 1
+TURN_SAFETY_MARGIN = 0.01  # Stop thinking this long before the limit
+
+PROFILE = False  # Time the turn phases
+PROFILE_WINDOW = 200  # Turns kept per phase
+PROFILE_REPORT_EVERY = 20  # Turns between summaries, 0 for none
+PROFILE_FILE = None  # Append summaries, skipped steps and overruns to this file instead of stderr
+
+TRANSPOSITION_TABLE_BITS = 16  # The table holds 2 ** bits evaluations
+
+
+class Profiler:
+    """
+    Sums the time spent in each phase over a turn, keeps the last `window` turns per phase and reports p50/p95/max.
+    Costs nothing when disabled: profile() hands the function back untouched and phase() a shared empty context.
+    count() keeps running totals of events, reported next to the phases.
+    """
+    def __init__(self, enabled, window, report_every, path=None):
+        self.enabled = enabled
+        self.window = window
+        self.report_every = report_every
+        self.path = path
+        self.current = {}  # Phase -> seconds spent in it this turn
+        self.history = {}
+        self.counts = {}  # Event -> times it happened so far
+        self.turns = 0
+        self.disabled_phase = nullcontext()
+
+    def profile(self, name=None):
+        def decorator(function):
+            if not self.enabled:
+                return function
+            phase = name or function.__name__
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.add(phase, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def phase(self, name):
+        if not self.enabled:
+            return self.disabled_phase
+        return self.timed_phase(name)
+
+    @contextmanager
+    def timed_phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, duration):
+        self.current[name] = self.current.get(name, 0) + duration
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def end_turn(self):
+        if not self.enabled:
+            return
+        for name, duration in self.current.items():
+            if name not in self.history:
+                self.history[name] = deque(maxlen=self.window)
+            self.history[name].append(duration)
+        self.current.clear()
+        self.turns += 1
+        if self.report_every and self.turns % self.report_every == 0:
+            self.report()
+
+    def summary(self):
+        lines = [f"Turn {self.turns}, ms per turn over the last {self.window}:"]
+        for name, durations in self.history.items():
+            ordered = sorted(durations)
+            p50 = ordered[len(ordered) // 2]
+            p95 = ordered[min(len(ordered) - 1, len(ordered) * 95 // 100)]
+            lines.append(f"  {name}: p50 {p50 * 1000:.2f} p95 {p95 * 1000:.2f} max {ordered[-1] * 1000:.2f} ({len(ordered)} turns)")
+        for name, count in self.counts.items():
+            lines.append(f"  {name}: {count} in {self.turns} turns")
+        return lines
+
+    def report(self):
+        text = "\n".join(self.summary()) + "\n"
+        if self.path:
+            with open(self.path, "a") as file:
+                file.write(text)
+        else:
+            sys.stderr.write(text)
+            sys.stderr.flush()
+
+
+class TurnScheduler:
+    """
+    Turn clock, started when the turn's first input arrives. Steps check expired() or time_left() in between
+    and stop safety_margin before the limit, leaving a cheap fallback in place. Skipped steps and turns that
+    overran the limit anyway are written out once the turn's commands are sent, to path or stderr.
+    """
+    def __init__(self, time_limit, first_time_limit, safety_margin, path=None):
+        self.time_limit = time_limit
+        self.first_time_limit = first_time_limit
+        self.safety_margin = safety_margin
+        self.path = path
+        self.turn = 0
+        self.running = False
+        self.start = 0
+        self.limit = 0
+        self.deadline = 0
+        self.events = []  # This turn's skipped steps and overrun, not written yet
+
+    def start_turn(self):
+        # Does nothing within a running turn: the first turn's clock starts with the initial input
+        if self.running:
+            return
+        self.running = True
+        self.turn += 1
+        self.start = time.perf_counter()
+        self.limit = self.start + (self.first_time_limit if self.turn == 1 else self.time_limit)
+        self.deadline = self.limit - self.safety_margin
+
+    def time_left(self):
+        return self.deadline - time.perf_counter()
+
+    def expired(self):
+        return time.perf_counter() >= self.deadline
+
+    def skip(self, step):
+        self.events.append(f"Turn {self.turn}: no time for {step}")
+
+    def finish_turn(self):
+        self.running = False
+        elapsed = time.perf_counter() - self.start
+        if self.start + elapsed > self.limit:
+            self.events.append(f"Turn {self.turn}: over the limit, {elapsed * 1000:.1f}ms")
+        if self.events:
+            self.report()
+
+    def report(self):
+        # Written every turn rather than at the end: the referee just kills us when the game is over
+        text = "\n".join(self.events) + "\n"
+        self.events.clear()
+        if self.path:
+            with open(self.path, "a") as file:
+                file.write(text)
+        else:
+            sys.stderr.write(text)
+            sys.stderr.flush()
+
+
+profiler = Profiler(PROFILE, PROFILE_WINDOW, PROFILE_REPORT_EVERY, PROFILE_FILE)
+scheduler = TurnScheduler(TURN_TIME_LIMIT, FIRST_TURN_TIME_LIMIT, TURN_SAFETY_MARGIN, PROFILE_FILE)
+
 
 def is_covered(position: Point, enemy_position, cover_position, direction) -> bool:
     if enemy_position - position <= enemy_position - (position + direction + direction):
@@ -79,6 +436,26 @@ class GameMap:
         self.height = height
         self.width = width
         self.tiles = [[-1 for _ in range(width)] for _ in range(height)]
+        self.points = [Point(index % width, index // width) for index in range(width * height)]
+        # Indices left over from a previous map of another size are meaningless now
+        for point in Point._interned.values():
+            object.__setattr__(point, "index", -1)
+        for index, point in enumerate(self.points):
+            object.__setattr__(point, "index", index)
+        Point.distances = [[abs(point.x - other.x) + abs(point.y - other.y) for other in self.points] for point in self.points]
+        # In-bounds neighbours of every tile, in pathfinding order
+        self.neighbours = [[point + direction for direction in [(1, 0), (-1, 0), (0, 1), (0, -1)] if self.is_within(point + direction)]
+                           for point in self.points]
+        # Tiles a bomb thrown at every tile splashes, with the glancing hit coefficient of each
+        self.splash = [[(other.index, 1 - THROW_GLANCING_HIT_PENALTY * (point - other))
+                        for other in (Point(point.x + dx, point.y + dy) for dy in range(-1, 2) for dx in range(-1, 2)) if self.is_within(other)]
+                       for point in self.points]
+        # Tiles within throwing distance of every tile, in row-major order
+        self.throw_ranges = [[other for other in self.points if Point.distances[point.index][other.index] <= THROW_DISTANCE]
+                             for point in self.points]
+        self.protection = []  # Filled by build_protection once the tiles are known
+        self.covers = []
+        self.cover_spots = {}
 
     def __getitem__(self, index) -> int:
         row: int = -1
@@ -103,6 +480,44 @@ class GameMap:
     def is_within(self, point: Point) -> bool:
         return 0 <= point.x < self.width and 0 <= point.y < self.height
 
+    def build_cover_index(self):
+        """
+        Cover tiles, and for each spawn side (True for the left one) the free in-bounds tiles hiding behind a cover
+        from the other side, as (position, cover position, direction towards the cover), nearest to the centre first.
+        """
+        self.covers = [point for point in self.points if self[point] > 0]
+        middle = Point(self.width // 2, self.height // 2)
+        for left_side, direction in [(True, (1, 0)), (False, (-1, 0))]:
+            spots = []
+            for cover_position in self.covers:
+                position = Point(cover_position.x - direction[0], cover_position.y)
+                if not self.is_within(position) or self[position] != 0:
+                    continue
+                if (position.x <= self.width // 2) if left_side else (position.x >= self.width // 2):
+                    spots.append((position, cover_position, direction))
+            spots.sort(key=lambda spot: spot[0] - middle)
+            self.cover_spots[left_side] = spots
+
+    def build_protection(self):
+        """
+        Cover protection of every target tile against every attacker tile, as protection[target][attacker].
+        Tiles never change after the initial input, so this is done once.
+        """
+        self.protection = [[0] * len(self.points) for _ in self.points]
+        for target_position in self.points:
+            covers = []
+            for direction in [(-1, 0), (1, 0), (0, 1), (0, -1)]:
+                cover_position = target_position + direction
+                if self.is_within(cover_position) and self[cover_position] > 0:
+                    covers.append((cover_position, direction, COVER_DEFENCE_VALUES[self[cover_position]]))
+            if not covers:
+                continue
+            row = self.protection[target_position.index]
+            for attacker_position in self.points:
+                for cover_position, direction, cover_value in covers:
+                    if is_covered(target_position, attacker_position, cover_position, direction):
+                        row[attacker_position.index] = max(row[attacker_position.index], cover_value)
+
 class Agent:
     def __init__(self, id, player, shoot_cooldown, optimal_range, soaking_power, splash_bombs):
         self.id = id
@@ -123,7 +538,7 @@ class Agent:
     def act(self, commands):
         args = [str(self.id)] + [command[0](*command[1:]) for command in commands if command is not None]
         line = ";".join(args)
-        print(line)
+        writer.write(line)
 
     @property
     def role(self):
@@ -136,6 +551,38 @@ class Agent:
             self.selected_phrase_index = -1
 
 
+class TranspositionTable:
+    """
+    Fixed-size table of evaluations keyed by Zobrist hash, one entry per slot.
+    Entries from previous turns are stale and always replaced, otherwise the deeper one (more agents planned) stays.
+    """
+    def __init__(self, bits=TRANSPOSITION_TABLE_BITS):
+        self.mask = (1 << bits) - 1
+        self.keys = [0] * (self.mask + 1)
+        self.values = [0] * (self.mask + 1)
+        self.depths = [-1] * (self.mask + 1)
+        self.generations = [-1] * (self.mask + 1)
+        self.generation = 0
+
+    def new_generation(self):
+        self.generation += 1
+
+    def get(self, key):
+        slot = key & self.mask
+        if self.keys[slot] == key and self.generations[slot] == self.generation:
+            profiler.count("transposition hits")
+            return self.values[slot]
+        return None
+
+    def put(self, key, value, depth):
+        slot = key & self.mask
+        if self.generations[slot] != self.generation or depth >= self.depths[slot]:
+            self.keys[slot] = key
+            self.values[slot] = value
+            self.depths[slot] = depth
+            self.generations[slot] = self.generation
+
+
 class GameState:
     def __init__(self, my_id):
         self.my_id = my_id
@@ -145,35 +592,56 @@ class GameState:
         self.my_agents: list[Agent] = []
         self.enemy_agents: list[Agent] = []
         self.influence = 0
+        self.ownership = []
+        self.influence_rows = {}
+        self.my_distances = []
+        self.enemy_distances = []
         self.stepped = []
         self.thrown_bombs = []
+        self.bomb_values = {}
+        self.path_fields = {}
+        self.threat = {}
+        self.bomb_threat = None
+        self.occupancy = []  # Agents standing on or heading for every tile
+        self.journal = []  # (kind, agent, previous value) of every simulated change this turn
+        self.hash = 0  # Zobrist hash of agent positions, wetness, bombs and cooldowns, kept up to date by the journal
+        self.zobrist_keys = {}
+        self.zobrist_random = random.Random(0)  # Own generator, so message choices stay the same
+        self.transposition_table = TranspositionTable()
+        self.path_buckets = [[] for _ in range(PATH_BLOCKED + 1)]
 
     def read_initial_input(self):
-        agent_count = int(input())
+        agent_count = reader.read_int()
         for i in range(agent_count):
-            agent_id, player, shoot_cooldown, optimal_range, soaking_power, splash_bombs = [int(j) for j in
-                                                                                            input().split()]
+            agent_id, player, shoot_cooldown, optimal_range, soaking_power, splash_bombs = reader.read_ints(6)
             self.agents[agent_id] = Agent(agent_id, player, shoot_cooldown, optimal_range, soaking_power, splash_bombs)
 
-        width, height = [int(i) for i in input().split()]
+        width, height = reader.read_ints(2)
         self.game_map = GameMap(height, width)
         self.stepped = [[0 for _ in range(self.game_map.width)] for _ in range(self.game_map.height)]
         for i in range(height):
-            inputs = input().split()
+            inputs = reader.read_ints(3 * width)
             for j in range(width):
-                self.game_map.tiles[i][j] = int(inputs[3 * j + 2])
+                self.game_map.tiles[i][j] = inputs[3 * j + 2]
+        self.game_map.build_protection()
+        self.game_map.build_cover_index()
 
 
+    @profiler.profile()
     def update_turn_input(self):
         self.turn += 1
         self.my_agents = []
         self.enemy_agents = []
         self.thrown_bombs = []
+        self.bomb_values = {}
+        self.path_fields = {}
+        self.threat = {}
+        self.bomb_threat = None
 
-        agent_count = int(input())
+        agent_count = reader.read_int()
         alive_agents_ids = set()
         for i in range(agent_count):
-            agent_id, x, y, cooldown, splash_bombs, wetness = [int(j) for j in input().split()]
+            agent_id, x, y, cooldown, splash_bombs, wetness = reader.read_ints(6)
             agent = self.agents[agent_id]
             agent.position = Point(x, y)
             self.stepped[y][x] += 1
@@ -197,12 +665,105 @@ class GameState:
             if agent.id not in alive_agents_ids:
                 self.agents.pop(agent.id)
 
+        self.journal = []
+        self.occupancy = [0] * len(self.game_map.points)
+        for agent in self.agents.values():
+            self.occupancy[agent.position.index] += 1
+        self.hash = 0
+        for agent in self.agents.values():
+            self.hash ^= self.get_zobrist_key("position", agent.id, agent.position.index)
+            self.hash ^= self.get_zobrist_key("wetness", agent.id, self.get_wetness_key(agent.wetness))
+            self.hash ^= self.get_zobrist_key("bombs", agent.id, agent.splash_bombs)
+            self.hash ^= self.get_zobrist_key("cooldown", agent.id, agent.cooldown)
+        self.transposition_table.new_generation()
+
         self.update_influence()
         self.update_roles()
 
-        my_agent_count = int(input())
+        my_agent_count = reader.read_int()
         assert my_agent_count == len(self.my_agents)
 
+    # Every simulated change goes through the methods below, which journal the previous value,
+    # so a what-if evaluation is just checkpoint(), a few simulated actions and rollback(checkpoint)
+
+    def checkpoint(self):
+        return len(self.journal)
+
+    def rollback(self, checkpoint):
+        changed_positions = []
+        while len(self.journal) > checkpoint:
+            kind, agent, value = self.journal.pop()
+            if kind == "position":
+                changed_positions += [agent.position, value]
+                self.place_agent(agent, value)
+            elif kind == "wetness":
+                changed_positions.append(agent.position)
+                self.place_wetness(agent, value)
+            elif kind == "bombs":
+                self.place_bombs(agent, value)
+            elif kind == "thrown_bomb":
+                self.thrown_bombs.pop()
+            elif kind == "desired_position":
+                self.place_desired_position(agent, value)
+        self.refresh_bomb_values(changed_positions)
+
+    def set_desired_position(self, agent: Agent, position):
+        self.journal.append(("desired_position", agent, agent.desired_position))
+        self.place_desired_position(agent, position)
+
+    def move_agent(self, agent: Agent, position: Point):
+        previous_position = agent.position
+        self.journal.append(("position", agent, previous_position))
+        self.place_agent(agent, position)
+        self.refresh_bomb_values([previous_position, position])
+
+    def add_wetness(self, agent: Agent, wetness):
+        self.journal.append(("wetness", agent, agent.wetness))
+        self.place_wetness(agent, agent.wetness + wetness)
+
+    def spend_bomb(self, agent: Agent):
+        self.journal.append(("bombs", agent, agent.splash_bombs))
+        self.place_bombs(agent, agent.splash_bombs - 1)
+
+    def add_thrown_bomb(self, throw_position: Point):
+        self.journal.append(("thrown_bomb", None, None))
+        self.thrown_bombs.append(throw_position)
+
+    def place_desired_position(self, agent: Agent, position):
+        for point, delta in [(agent.desired_position, -1), (position, 1)]:
+            if point is not None and point.index >= 0:
+                self.occupancy[point.index] += delta
+        agent.desired_position = position
+
+    def place_agent(self, agent: Agent, position: Point):
+        self.occupancy[agent.position.index] -= 1
+        self.occupancy[position.index] += 1
+        self.hash ^= self.get_zobrist_key("position", agent.id, agent.position.index) ^ self.get_zobrist_key("position", agent.id, position.index)
+        agent.position = position
+
+    def place_wetness(self, agent: Agent, wetness):
+        self.hash ^= self.get_zobrist_key("wetness", agent.id, self.get_wetness_key(agent.wetness))
+        self.hash ^= self.get_zobrist_key("wetness", agent.id, self.get_wetness_key(wetness))
+        agent.wetness = wetness
+
+    def place_bombs(self, agent: Agent, splash_bombs):
+        self.hash ^= self.get_zobrist_key("bombs", agent.id, agent.splash_bombs) ^ self.get_zobrist_key("bombs", agent.id, splash_bombs)
+        agent.splash_bombs = splash_bombs
+
+    def get_wetness_key(self, wetness):
+        # Exactly what the evaluation reads: hunkering and cover make simulated wetness fractional,
+        # and anything from 100 up counts the same
+        return min(wetness, 100)
+
+    def get_zobrist_key(self, *feature):
+        """
+        Random 64-bit key of a (kind, agent id, value) feature, drawn the first time it's needed.
+        """
+        key = self.zobrist_keys.get(feature)
+        if key is None:
+            key = self.zobrist_keys[feature] = self.zobrist_random.getrandbits(64)
+        return key
+
     def update_roles(self):
         for agent in self.my_agents:
             if agent.soaking_power == 16:
@@ -216,29 +777,209 @@ class GameState:
 
 
 
+    @profiler.profile()
     def update_influence(self):
-        self.influence = 0
-        for y in range(self.game_map.height):
-            for x in range(self.game_map.width):
-                position = Point(x, y)
-                closest_my_agent = 1e18
-                for agent in self.my_agents:
-                    if agent.wetness < 50:
-                        closest_my_agent = min(closest_my_agent, agent.position - position)
-                    else:
-                        closest_my_agent = min(closest_my_agent, (agent.position - position) * 2)
-
-                closest_enemy_agent = 1e18
-                for agent in self.enemy_agents:
-                    if agent.wetness < 50:
-                        closest_enemy_agent = min(closest_enemy_agent, agent.position - position)
-                    else:
-                        closest_enemy_agent = min(closest_enemy_agent, (agent.position - position) * 2)
-
-                if closest_my_agent < closest_enemy_agent:
-                    self.influence += 1
-                if closest_my_agent > closest_enemy_agent:
-                    self.influence -= 1
+        """
+        Nearest agent of each team for every tile in one pass over the precomputed distance rows,
+        a wet agent (wetness >= 50) counting double. Ownership is 1 for my tiles, -1 for enemy tiles
+        and 0 for ties.
+        """
+        self.influence_rows = {}
+        self.my_distances = self.get_closest_distances(self.my_agents)
+        self.enemy_distances = self.get_closest_distances(self.enemy_agents)
+        self.ownership = [(mine < theirs) - (mine > theirs) for mine, theirs in zip(self.my_distances, self.enemy_distances)]
+        self.influence = sum(self.ownership)
+        return self.influence, self.ownership
+
+    def get_closest_distances(self, agents):
+        rows = []
+        for agent in agents:
+            row = Point.distances[agent.position.index]
+            if agent.wetness >= 50:
+                row = [distance * 2 for distance in row]
+            self.influence_rows[agent.id] = row
+            rows.append(row)
+        if not rows:
+            return [1e18] * len(self.game_map.points)
+        if len(rows) == 1:
+            return list(rows[0])
+        return list(map(min, *rows))
+
+    def get_move_influence_deltas(self, agent):
+        """
+        Influence change for every tile the agent can step to this turn, staying put included.
+        A step changes the agent's distance to any tile by at most one (two when wet), so only tiles
+        where it is that close to its team's nearest distance can change hands and get rescanned.
+        """
+        mine = agent.player == self.my_id
+        sign = 1 if mine else -1
+        team_distances = self.my_distances if mine else self.enemy_distances
+        other_distances = self.enemy_distances if mine else self.my_distances
+        teammates = [self.influence_rows[ally.id] for ally in (self.my_agents if mine else self.enemy_agents) if ally is not agent]
+        factor = 1 if agent.wetness < 50 else 2
+        row = self.influence_rows[agent.id]
+        affected = [index for index, distance in enumerate(row) if distance - factor <= team_distances[index]]
+        rest = [min([1e18] + [teammate[index] for teammate in teammates]) for index in affected]
+        occupied = {other.position for other in self.agents.values()}
+
+        deltas = {agent.position: 0}
+        for position in self.game_map.neighbours[agent.position.index]:
+            if self.game_map[position] > 0 or position in occupied:
+                continue
+            moved = Point.distances[position.index]
+            delta = 0
+            for index, others in zip(affected, rest):
+                distance = min(others, moved[index] * factor)
+                theirs = other_distances[index]
+                delta += sign * ((distance < theirs) - (distance > theirs)) - self.ownership[index]
+            deltas[position] = delta
+        return deltas
+
+
+    def get_bomb_hit_value(self, player, affected_agent, coefficient):
+        coeff = coefficient
+        if affected_agent.player == player:
+            coeff *= THROW_FRIENDLY_FIRE_PENALTY
+        if affected_agent.wetness < 100:
+            coeff *= (1 + THROW_LOW_HP_BONUS / (100 - affected_agent.wetness))
+        return coeff * BOMB_DAMAGE
+
+    def get_bomb_values(self, player):
+        """
+        Value of a bomb thrown by the player at every tile, computed once per turn:
+        each agent's hit value is spread over the 3x3 splash around it.
+        """
+        if player not in self.bomb_values:
+            values = [BOMB_DAMAGE * BOMB_USAGE_PENALTY] * len(self.game_map.points)
+            for affected_agent in self.agents.values():
+                for index, coefficient in self.game_map.splash[affected_agent.position.index]:
+                    values[index] += self.get_bomb_hit_value(player, affected_agent, coefficient)
+            self.bomb_values[player] = values
+        return self.bomb_values[player]
+
+    def refresh_bomb_values(self, positions):
+        """
+        Recomputes bomb values of the tiles splashing any of the positions, after agents there moved or got wet.
+        """
+        if not self.bomb_values:
+            return
+        tiles = {index for position in positions for index, _ in self.game_map.splash[position.index]}
+        for player, values in self.bomb_values.items():
+            for index in tiles:
+                throw_position = self.game_map.points[index]
+                value = BOMB_DAMAGE * BOMB_USAGE_PENALTY
+                for affected_agent in self.agents.values():
+                    if abs(affected_agent.position.x - throw_position.x) <= 1 and abs(affected_agent.position.y - throw_position.y) <= 1:
+                        coefficient = 1 - THROW_GLANCING_HIT_PENALTY * (affected_agent.position - throw_position)
+                        value += self.get_bomb_hit_value(player, affected_agent, coefficient)
+                values[index] = value
+
+
+    @profiler.profile()
+    def get_threat(self, extra_protection=0):
+        """
+        Damage every tile would take if all enemies shot at it, built once per turn for each extra protection.
+        Only our agents are simulated during the turn, so enemy positions can't go stale.
+        """
+        if extra_protection not in self.threat:
+            threat = []
+            for position in self.game_map.points:
+                damage = 0
+                for enemy in self.enemy_agents:
+                    damage += calculate_damage(self, enemy, position, extra_protection)
+                threat.append(damage)
+            self.threat[extra_protection] = threat
+        return self.threat[extra_protection]
+
+    def get_bomb_threat(self):
+        """
+        Number of enemies that could splash every tile this turn: a step, then a throw, then the 3x3 splash.
+        """
+        if self.bomb_threat is None:
+            self.bomb_threat = [0] * len(self.game_map.points)
+            for enemy in self.enemy_agents:
+                if enemy.splash_bombs == 0:
+                    continue
+                reached = set()
+                for throw_position in self.game_map.points:
+                    if Point.distances[enemy.position.index][throw_position.index] <= THROW_DISTANCE + 1:
+                        reached.update(index for index, _ in self.game_map.splash[throw_position.index])
+                for index in reached:
+                    self.bomb_threat[index] += 1
+        return self.bomb_threat
+
+    @profiler.profile()
+    def get_path_field(self, start_position: Point, target_agent: Agent, STAY_AWAY_RANGE):
+        """
+        Shortest path costs and parents from the start to every tile (-1 if unreachable), and the step priorities.
+        Entering a tile costs 1 + its priority: teammates push it up within STAY_AWAY_RANGE,
+        while covers, bomb splashes and teammates adjacent to the start block it.
+        Cached for the turn by everything the priorities depend on.
+        """
+        teammates = [agent for agent in self.agents.values() if agent.player == target_agent.player and agent.id != target_agent.id]
+        key = (target_agent.player, start_position, STAY_AWAY_RANGE, tuple(agent.position for agent in teammates), tuple(self.thrown_bombs))
+        if key in self.path_fields:
+            return self.path_fields[key]
+
+        game_map = self.game_map
+        priority = [PATH_BLOCKED if tile > 0 else 0 for row in game_map.tiles for tile in row]
+        for agent in teammates:
+            for x2 in range(agent.position.x - STAY_AWAY_RANGE, agent.position.x + STAY_AWAY_RANGE + 1):
+                for y2 in range(agent.position.y - STAY_AWAY_RANGE, agent.position.y + STAY_AWAY_RANGE + 1):
+                    position = Point(x2, y2)
+                    if game_map.is_within(position):
+                        if position == agent.position and position - start_position <= 1:
+                            priority[position.index] = PATH_BLOCKED
+                        if STAY_AWAY_RANGE != 0:
+                            priority[position.index] = min(priority[position.index] + STAY_AWAY_RANGE * 2 + 1 - (position - agent.position), PATH_BLOCKED)
+        for bomb in self.thrown_bombs:
+            for index, _ in game_map.splash[bomb.index]:
+                priority[index] = PATH_BLOCKED
+
+        # Dial's algorithm: step costs are below PATH_BLOCKED + 1, so that many buckets used circularly suffice
+        costs = [-1] * len(game_map.points)
+        parents = [-1] * len(game_map.points)
+        buckets = self.path_buckets
+        costs[start_position.index] = 0
+        buckets[0].append(start_position.index)
+        pending = 1
+        cost = 0
+        while pending:
+            bucket = buckets[cost % len(buckets)]
+            for index in bucket:
+                pending -= 1
+                if costs[index] != cost:
+                    continue
+                for neighbour in game_map.neighbours[index]:
+                    step = priority[neighbour.index]
+                    if step == PATH_BLOCKED:
+                        continue
+                    new_cost = cost + 1 + step
+                    if costs[neighbour.index] == -1 or new_cost < costs[neighbour.index]:
+                        costs[neighbour.index] = new_cost
+                        parents[neighbour.index] = index
+                        buckets[new_cost % len(buckets)].append(neighbour.index)
+                        pending += 1
+            bucket.clear()
+            cost += 1
+
+        self.path_fields[key] = (costs, parents, priority)
+        return self.path_fields[key]
+
+
+def calculate_damage(game_state: GameState, agent: Agent, target_position: Point, extra_protection, ignore_cover=False):
+    distance = target_position - agent.position
+    basic_damage: float = 0
+    if distance <= agent.optimal_range:
+        basic_damage = agent.soaking_power
+    elif distance <= agent.optimal_range * 2:
+        basic_damage = agent.soaking_power / 2
+    protection = 0
+    if not ignore_cover:
+        protection = game_state.game_map.protection[target_position.index][agent.position.index]
+
+    damage = basic_damage * (1 - protection - extra_protection)
+    return damage
 
 
 def calculate_agent_value(game_state: GameState, agent: Agent) -> float:
@@ -251,93 +992,70 @@ class Strategy(ABC):
     name = ""
 
     def calculate_damage(self, game_state: GameState, agent: Agent, target_position: Point, extra_protection, ignore_cover=False):
-        distance = target_position - agent.position
-        basic_damage: float = 0
-        if distance <= agent.optimal_range:
-            basic_damage = agent.soaking_power
-        elif distance <= agent.optimal_range * 2:
-            basic_damage = agent.soaking_power / 2
-        directions = [(-1, 0), (1, 0), (0, 1), (0, -1)]
-        protection = 0
-        for direction in directions:
-            cover_position: Point = target_position + direction
-            if not game_state.game_map.is_within(cover_position):
-                continue
-            cover_value = COVER_DEFENCE_VALUES[game_state.game_map[cover_position]]
-            if game_state.game_map.is_within(cover_position):
-                if not ignore_cover and is_covered(target_position, agent.position, cover_position, direction):
-                    protection = max(protection, cover_value)
-
-        damage = basic_damage * (1 - protection - extra_protection)
-        return damage
+        return calculate_damage(game_state, agent, target_position, extra_protection, ignore_cover)
 
     def calculate_recieved_damage_if_targeted(self, game_state: GameState, position: Point, extra_protection=0):
-        damage = 0
-        for enemy in game_state.enemy_agents:
-            damage += self.calculate_damage(game_state, enemy, position, extra_protection)
-        return damage
+        return game_state.get_threat(extra_protection)[position.index]
+
+    def get_safest_forward_position(self, game_state: GameState, agent: Agent, extra_protection, max_cost):
+        """
+        Safest tile the agent can reach for at most max_cost without falling back towards its spawn,
+        ranked by damage if targeted, then by enemy bombs able to reach it, then by progress and path cost.
+        """
+        costs, _, _ = game_state.get_path_field(agent.position, agent, 0)
+        threat = game_state.get_threat(extra_protection)
+        bomb_threat = game_state.get_bomb_threat()
+        progress = abs(agent.position.x - agent.spawn_position.x)
+        best_position = None
+        best_key = None
+        for position in game_state.game_map.points:
+            cost = costs[position.index]
+            if cost == -1 or cost > max_cost or abs(position.x - agent.spawn_position.x) < progress:
+                continue
+            key = (threat[position.index], bomb_threat[position.index], -abs(position.x - agent.spawn_position.x), cost)
+            if best_key is None or key < best_key:
+                best_position, best_key = position, key
+        return best_position
 
     def is_point_occupied(self, game_state: GameState, point: Point):
-        for agent in game_state.agents.values():
-            if agent.position == point:
-                return True
-            if agent.desired_position == point:
-                return True
-        return False
-
-    def get_possible_throw_positions(self, game_state: GameState, agent : Agent):
-        possible_throw_positions = []
-        for y in range(game_state.game_map.height):
-            for x in range(game_state.game_map.width):
-                throw_position = Point(x, y)
-                if throw_position - agent.position <= THROW_DISTANCE:
-                    weight = 0
-                    weight += BOMB_DAMAGE * BOMB_USAGE_PENALTY
-                    for affected_agent in game_state.agents.values():
-                        if abs(affected_agent.position.x - throw_position.x) <= 1 and abs(
-                                affected_agent.position.y - throw_position.y) <= 1:
-                            dealt_damage = BOMB_DAMAGE
-                            coeff = 1
-                            coeff *= (1 - THROW_GLANCING_HIT_PENALTY * (affected_agent.position - throw_position))
-                            if affected_agent.player == agent.player:
-                                coeff *= THROW_FRIENDLY_FIRE_PENALTY
-                            if affected_agent.wetness < 100:
-                                coeff *= (1 + THROW_LOW_HP_BONUS / (100 - affected_agent.wetness))
-
-                            weight += coeff * dealt_damage
-
-                            coeff *= calculate_agent_value(game_state, affected_agent)
-                            if agent.id == 6:
-                                print(affected_agent.id, coeff, dealt_damage, file=sys.stderr)
-                    possible_throw_positions.append((weight, throw_position))
-
-        possible_throw_positions.sort(key=lambda x: -x[0])
-        return possible_throw_positions
-
-    def simulate_throw(self, game_state: GameState, throw_position: Point):
-        game_state.thrown_bombs.append(throw_position)
+        return game_state.occupancy[point.index] > 0
+
+    @profiler.profile()
+    def get_possible_throw_positions(self, game_state: GameState, agent : Agent, count=1):
+        """
+        Best throw targets of the agent as (value, position), best first.
+        """
+        if agent.splash_bombs == 0:
+            return []
+        bomb_values = game_state.get_bomb_values(agent.player)
+        throw_positions = ((bomb_values[position.index], position) for position in game_state.game_map.throw_ranges[agent.position.index])
+        return heapq.nlargest(count, throw_positions, key=lambda x: x[0])
+
+    def simulate_throw(self, game_state: GameState, throw_position: Point, agent: Agent = None):
+        if agent is not None:
+            game_state.spend_bomb(agent)
+        game_state.add_thrown_bomb(throw_position)
+        affected_positions = []
         for affected_agent in game_state.agents.values():
             if abs(affected_agent.position.x - throw_position.x) <= 1 and abs(
                     affected_agent.position.y - throw_position.y) <= 1:
-                affected_agent.wetness += 30
+                game_state.add_wetness(affected_agent, 30)
+                affected_positions.append(affected_agent.position)
+        game_state.refresh_bomb_values(affected_positions)
 
     def simulate_shot(self, game_state: GameState, agent: Agent, victim: Agent):
         damage = self.calculate_damage(game_state, agent, victim.position, 0.25)
-        victim.wetness += damage
+        game_state.add_wetness(victim, damage)
+        game_state.refresh_bomb_values([victim.position])
 
     def simulate_move(self, game_state : GameState, agent: Agent, position: Point):
         if position is None:
             return
         assert agent.position - position == 1
-        agent.position = position
+        game_state.move_agent(agent, position)
 
     def get_covers(self, game_state: GameState):
-        covers = []
-        for y in range(game_state.game_map.height):
-            for x in range(game_state.game_map.width):
-                if game_state.game_map[y, x] > 0:
-                    covers.append(Point(x, y))
-        return covers
+        return game_state.game_map.covers
 
     def get_best_enemy_to_attack(self, game_state: GameState, agent: Agent):
         def comp(enemy):
@@ -355,93 +1073,33 @@ class Strategy(ABC):
         return best_enemy
 
     def get_best_cover_target(self, game_state, agent: Agent):
-        possible_covers: list = []
-        agent.desired_position = None
-        if agent.spawn_position.x == 0:
-            possible_covers = [i + (-1, 0) for i in self.get_covers(game_state) if game_state.game_map[i + (-1, 0)] == 0]
-            possible_covers = [i for i in possible_covers if i.x <= game_state.game_map.width // 2]
-        else:
-            possible_covers = [i + (1, 0) for i in self.get_covers(game_state) if game_state.game_map[i + (1, 0)] == 0]
-            possible_covers = [i for i in possible_covers if i.x >= game_state.game_map.width // 2]
-        middle = Point(game_state.game_map.width // 2, game_state.game_map.height // 2)
-        possible_covers.sort(key=lambda position: position - middle)
-        return possible_covers[0] if possible_covers else None
+        game_state.set_desired_position(agent, None)
+        for position, _, _ in game_state.game_map.cover_spots[agent.spawn_position.x == 0]:
+            if game_state.occupancy[position.index] - (position == agent.position) == 0:
+                return position
+        return None
 
+    @profiler.profile()
     def get_next_path_position(self, game_state: GameState, start_position: Point, end_position: Point, target_agent: Agent, STAY_AWAY_RANGE):
-        width = game_state.game_map.width
-        height = game_state.game_map.height
-        priority_map = [[0 for _ in range(width)] for _ in range(height)]
-        previous_step = [[Point(-1, -1) for _ in range(width)] for _ in range(height)]
-        for y in range(height):
-            for x in range(width):
-                if game_state.game_map[y, x] > 0:
-                    priority_map[y][x] = 29
-
-        for agent in game_state.agents.values():
-            if agent.id == target_agent.id:
-                continue
-            for x2 in range(agent.position.x - STAY_AWAY_RANGE, agent.position.x + STAY_AWAY_RANGE + 1):
-                for y2 in range(agent.position.y - STAY_AWAY_RANGE, agent.position.y + STAY_AWAY_RANGE + 1):
-                    position = Point(x2, y2)
-                    if game_state.game_map.is_within(position):
-                        if agent.player == target_agent.player:
-                            if agent.id != target_agent.id:
-                                if position == agent.position and position - start_position <= 1:
-                                    priority_map[y2][x2] = 29
-                                if STAY_AWAY_RANGE != 0:
-                                    priority_map[y2][x2] += STAY_AWAY_RANGE * 2 + 1 - (position - agent.position)
-                                    priority_map[y2][x2] = min(priority_map[y2][x2], 29)
-
-        for bomb in game_state.thrown_bombs:
-            for x2 in range(bomb.x - 1, bomb.x + 2):
-                for y2 in range(bomb.y - 1, bomb.y + 2):
-                    position = Point(x2, y2)
-                    if game_state.game_map.is_within(position):
-                        priority_map[y2][x2] = 29
-
-        directions = [(1, 0), (-1, 0), (0, 1), (0, -1)]
-        q = [deque() for _ in range(30)]
-        q[priority_map[start_position.y][start_position.x]].append(start_position)
-        steps = 1
-        while sum([len(i) for i in q]) > 0:
-            i = 0
-            while i < 30:
-                flag = False
-                if len(q[i]) > 0:
-                    now = q[i].popleft()
-                    if now != start_position and priority_map[start_position.y][start_position.x] > 0:
-                        return now
-
-                    for direction in directions:
-                        now2 = now + direction
-                        if not game_state.game_map.is_within(now2):
-                            continue
-
-
-                        if priority_map[now2.y][now2.x] != 29 and previous_step[now2.y][now2.x].x == -1:
-                            q[priority_map[now2.y][now2.x]].append(now2)
-                            previous_step[now2.y][now2.x] = now
-                            flag = True
-                            steps += 1
-
-                if flag:
-                    break
-                i += 1
-
-
-        now = start_position
-        for y in range(height):
-            for x in range(width):
-                if previous_step[y][x].x != -1:
-                    if now == start_position or (now - end_position) > (Point(x, y) - end_position):
-                        now = Point(x, y)
-
-        while True:
-            if now == Point(-1, -1):
-                return None
-            if previous_step[now.y][now.x] == start_position:
-                return now
-            now = previous_step[now.y][now.x]
+        """
+        First step of the cheapest path towards the reachable tile closest to the end position,
+        or of the cheapest escape if the start tile itself should be avoided. None to stay.
+        """
+        costs, parents, priority = game_state.get_path_field(start_position, target_agent, STAY_AWAY_RANGE)
+        points = game_state.game_map.points
+        if priority[start_position.index] > 0:
+            reachable = [position for position in game_state.game_map.neighbours[start_position.index] if costs[position.index] > 0]
+            return min(reachable, key=lambda position: costs[position.index]) if reachable else None
+
+        best_index = start_position.index
+        for index, cost in enumerate(costs):
+            if cost != -1 and points[index] - end_position < points[best_index] - end_position:
+                best_index = index
+        if best_index == start_position.index:
+            return None
+        while parents[best_index] != start_position.index:
+            best_index = parents[best_index]
+        return points[best_index]
 
     def should_stay_away(self, game_state: GameState, agent: Agent):
         for enemy in game_state.enemy_agents:
@@ -468,6 +1126,7 @@ class Strategy(ABC):
     def get_attack_action(self, game_state: GameState, agent: Agent):
         pass
 
+    @profiler.profile()
     def get_actions_for_agent(self, game_state: GameState, agent: Agent):
         actions = [None, None, None]
 
@@ -481,7 +1140,7 @@ class Strategy(ABC):
         if attack_action:
             if len(attack_action) == 1 or attack_action[1]:
                 if attack_action[0] == THROW:
-                    self.simulate_throw(game_state, attack_action[1])
+                    self.simulate_throw(game_state, attack_action[1], agent)
                 if attack_action[0] == SHOOT:
                     self.simulate_shot(game_state, agent, attack_action[1])
                 actions[1] = attack_action
@@ -506,7 +1165,7 @@ class SniperStrategy(Strategy):
             return None
         cover_target = self.get_best_cover_target(game_state, agent)
         if cover_target and cover_target != agent.position:
-            agent.desired_position = cover_target.copy()
+            game_state.set_desired_position(agent, cover_target)
             should_stay_away = self.should_stay_away(game_state, agent)
             cover_target = self.get_next_path_position(game_state, agent.position, cover_target, agent, 0)
             return (MOVE, cover_target)
@@ -549,10 +1208,16 @@ class HeavyStrategy(Strategy):
             else:
                 push_target += (-1, 0)
             if push_target and push_target != agent.position:
-                agent.desired_position = push_target.copy()
+                game_state.set_desired_position(agent, push_target)
                 should_stay_away = self.should_stay_away(game_state, agent)
                 push_target = self.get_next_path_position(game_state, agent.position, push_target, agent, STAY_AWAY_DISTANCE if should_stay_away else 0)
+                if push_target is None:
+                    return None
                 if self.has_enemy_to_attack(game_state, agent) and self.calculate_recieved_damage_if_targeted(game_state, agent.position, 0.25) < self.calculate_recieved_damage_if_targeted(game_state, push_target, 0.25):
+                    # The path step is more exposed, but a safer tile nearby may still hold the line
+                    safest_position = self.get_safest_forward_position(game_state, agent, 0.25, 1)
+                    if safest_position is not None and safest_position != agent.position:
+                        return (MOVE, safest_position)
                     return None
                 return (MOVE, push_target)
         return None
@@ -602,12 +1267,19 @@ class ScoutStrategy(Strategy):
             else:
                 desired_position = Point(0, agent.position.y)
         should_stay_away = self.should_stay_away(game_state, agent)
-        desired_position = self.get_next_path_position(game_state, agent.position, desired_position, agent, 0)
-        return (MOVE, desired_position)
+        next_position = self.get_next_path_position(game_state, agent.position, desired_position, agent, 0)
+        if agent.splash_bombs == 0 and enemy_with_most_bombs.splash_bombs == 0:
+            # Nothing to fear anymore: leave the path only for a step that gains territory
+            deltas = game_state.get_move_influence_deltas(agent)
+            best_position = max(deltas, key=deltas.get)
+            if deltas[best_position] > deltas.get(next_position, 0):
+                if best_position == agent.position:
+                    return None
+                next_position = best_position
+        return (MOVE, next_position)
 
     def get_attack_action(self, game_state: GameState, agent: Agent):
         throw_locations = self.get_possible_throw_positions(game_state, agent)
-        print(throw_locations, file=sys.stderr)
         throw_choice = (-1, None)
         if throw_locations and agent.splash_bombs > 0:
             throw_choice = throw_locations[0]
@@ -663,19 +1335,233 @@ def choose_strategy(game_state: GameState, agent: Agent):
         return ScoutStrategy
 
 
-my_id = int(input())
-game_state = GameState(my_id)
-game_state.read_initial_input()
+class JointActionSearch:
+    """
+    Beam search over the joint MOVE and SHOOT/THROW/HUNKER_DOWN choices of all my agents, one agent per level.
+    Plans are replayed on the live state through the journal, so nothing gets copied.
+    The beam widens each iteration until time runs out, keeping the plan of the last finished one.
+    Strategies path towards long-term goals the search can't see, so the moves they already chose serve as a prior.
+    """
+    def __init__(self, game_state: GameState, strategy_moves, deadline):
+        self.game_state = game_state
+        self.deadline = deadline
+        self.agents = list(game_state.my_agents)
+        self.strategies = [choose_strategy(game_state, agent)() for agent in self.agents]
+        self.strategy_moves = strategy_moves
+        self.root_wetness = {agent.id: agent.wetness for agent in game_state.agents.values()}
+        self.move_deltas = []
+        for agent in self.agents:
+            if time.perf_counter() > deadline:
+                self.move_deltas = None  # Not even set up in time, search() gives up straight away
+                break
+            self.move_deltas.append(game_state.get_move_influence_deltas(agent))
+
+    @profiler.profile()
+    def search(self):
+        """
+        Best plan found before the deadline as {agent id: [move action, attack action]}, or None if not even the greedy pass finished.
+        """
+        if self.move_deltas is None:
+            return None
+        best_plan = None
+        width = 1
+        while width <= SEARCH_MAX_BEAM_WIDTH:
+            plan = self.run_beam(width)
+            if plan is None:
+                break
+            best_plan = plan
+            width *= 2
+        if best_plan is None:
+            return None
+        return {agent.id: list(actions) for agent, actions in zip(self.agents, best_plan)}
+
+    def run_beam(self, width):
+        game_state = self.game_state
+        beam = [(self.evaluate([]), [])]
+        for level in range(len(self.agents)):
+            children = []
+            seen = set()  # Plans reaching the same state through other actions are only kept once
+            for _, plan in beam:
+                root = game_state.checkpoint()
+                self.apply(plan)
+                checkpoint = game_state.checkpoint()
+                options = self.get_options(level)
+                if options is None:
+                    game_state.rollback(root)
+                    return None
+                for actions in options:
+                    if time.perf_counter() > self.deadline:
+                        game_state.rollback(root)
+                        return None
+                    self.apply_actions(level, actions)
+                    child = plan + [actions]
+                    key = self.get_plan_key(child)
+                    if key not in seen:
+                        seen.add(key)
+                        score = game_state.transposition_table.get(key)
+                        if score is None:
+                            score = self.evaluate(child)
+                            game_state.transposition_table.put(key, score, len(child))
+                        children.append((score, child))
+                    game_state.rollback(checkpoint)
+                game_state.rollback(root)
+            beam = heapq.nlargest(width, children, key=lambda child: child[0])
+        return beam[0][1]
+
+    def get_plan_key(self, plan):
+        """
+        Hash of the state after the plan, plus what the evaluation reads from the plan itself:
+        how many agents are planned and which of them hunker down.
+        """
+        key = self.game_state.hash ^ self.game_state.get_zobrist_key("planned", len(plan))
+        for agent, actions in zip(self.agents, plan):
+            if actions[1][0] == HUNKER_DOWN:
+                key ^= self.game_state.get_zobrist_key("hunker", agent.id)
+        return key
+
+    def get_options(self, level):
+        """
+        Every move with every attack worth trying after it, or None if the deadline passed while listing them.
+        """
+        agent = self.agents[level]
+        strategy = self.strategies[level]
+        standing = {other.position for other in self.game_state.agents.values() if other is not agent}
+        options = []
+        for position in self.move_deltas[level]:
+            if position in standing:
+                continue
+            if time.perf_counter() > self.deadline:
+                return None
+            move_action = (MOVE, position) if position != agent.position else None
+            checkpoint = self.game_state.checkpoint()
+            strategy.simulate_move(self.game_state, agent, move_action[1] if move_action else None)
+            options.append((move_action, tuple([HUNKER_DOWN])))
+            if agent.cooldown == 0:
+                for enemy in self.game_state.enemy_agents:
+                    if enemy.wetness < 100 and calculate_damage(self.game_state, agent, enemy.position, 0.25) > 0:
+                        options.append((move_action, (SHOOT, enemy)))
+            for value, throw_position in strategy.get_possible_throw_positions(self.game_state, agent, SEARCH_THROW_CANDIDATES):
+                if value > 0:
+                    options.append((move_action, (THROW, throw_position)))
+            self.game_state.rollback(checkpoint)
+        return options
+
+    def apply(self, plan):
+        for level, actions in enumerate(plan):
+            self.apply_actions(level, actions)
+
+    def apply_actions(self, level, actions):
+        agent = self.agents[level]
+        strategy = self.strategies[level]
+        move_action, attack_action = actions
+        if move_action:
+            strategy.simulate_move(self.game_state, agent, move_action[1])
+        if attack_action[0] == THROW:
+            strategy.simulate_throw(self.game_state, attack_action[1], agent)
+        if attack_action[0] == SHOOT:
+            strategy.simulate_shot(self.game_state, agent, attack_action[1])
+
+    def evaluate(self, plan):
+        """
+        Wetness dealt to enemies, minus wetness we take from friendly bombs and enemy fire,
+        plus territory gained, the damage each agent could deal next turn from its new tile
+        and a bonus for moving where its strategy would.
+        """
+        game_state = self.game_state
+        score = 0
+        for agent in game_state.agents.values():
+            dealt = min(agent.wetness, 100) - min(self.root_wetness[agent.id], 100)
+            if agent.wetness >= 100 > self.root_wetness[agent.id]:
+                dealt += SEARCH_KILL_BONUS
+            score += dealt if agent.player != game_state.my_id else -dealt
+        hunkering = {self.agents[level].id for level, actions in enumerate(plan) if actions[1][0] == HUNKER_DOWN}
+        for level, agent in enumerate(self.agents):
+            if agent.wetness < 100:
+                score -= game_state.get_threat(0.25 if agent.id in hunkering else 0)[agent.position.index]
+            if level < len(plan):
+                score += self.move_deltas[level].get(agent.position, 0) * SEARCH_TERRITORY_WEIGHT
+                if agent.position == self.strategy_moves[level]:
+                    score += SEARCH_STRATEGY_MOVE_BONUS
+                firepower = [calculate_damage(game_state, agent, enemy.position, 0) for enemy in game_state.enemy_agents if enemy.wetness < 100]
+                score += max(firepower, default=0) * SEARCH_FIREPOWER_WEIGHT
+        return score
+
+
+def play():
+    reader.fill()
+    scheduler.start_turn()  # The first turn's clock starts with the initial input
+    my_id = reader.read_int()
+    game_state = GameState(my_id)
+    game_state.read_initial_input()
+
+    while True:
+        reader.fill()  # Waiting for the referee is not our time
+        scheduler.start_turn()
+        with profiler.phase("turn"):
+            game_state.update_turn_input()
+
+            # Cheapest first: everyone hunkers down, the strategies decide agent by agent while there is time,
+            # then the joint search may replace their plans
+            actions = {agent.id: [None, tuple([HUNKER_DOWN]), None] for agent in game_state.my_agents}
+            checkpoint = game_state.checkpoint()
+            for agent in game_state.my_agents:
+                if scheduler.expired():
+                    scheduler.skip(f"agent {agent.id}")
+                    continue
+                strategy = choose_strategy(game_state, agent)()
+                actions[agent.id] = strategy.get_actions_for_agent(game_state, agent)
+
+            if SEARCH_ENABLED:
+                # The strategies may have used up most of the turn, too little left isn't worth the setup
+                if scheduler.time_left() < SEARCH_MIN_TIME:
+                    scheduler.skip("search")
+                else:
+                    game_state.rollback(checkpoint)
+                    strategy_moves = [actions[agent.id][0][1] if actions[agent.id][0] else agent.position for agent in game_state.my_agents]
+                    deadline = min(scheduler.deadline, time.perf_counter() + SEARCH_TIME_BUDGET)
+                    plan = JointActionSearch(game_state, strategy_moves, deadline).search()
+                    if plan is None:
+                        scheduler.skip("search")
+                    else:
+                        for agent in game_state.my_agents:
+                            actions[agent.id] = plan[agent.id] + actions[agent.id][2:]
+
+            for agent in game_state.my_agents:
+                agent.act(actions[agent.id])
+            writer.flush()
+        profiler.end_turn()
+        scheduler.finish_turn()
 
-while True:
-    game_state.update_turn_input()
 
-    for agent in game_state.my_agents:
-        start = time.time()
-        strategy = choose_strategy(game_state, agent)()
-        actions = strategy.get_actions_for_agent(game_state, agent)
-        #print(time.time() - start, file=sys.stderr)
-        agent.act(actions)
+def replay(path):
+    """
+    Plays a recorded game back without the referee and compares our commands with the recorded ones.
+    """
+    turns = ReplayRecorder.load(path)
+    reader.stream = io.BytesIO(b"".join(b"\n".join(inputs) + b"\n" for inputs, _ in turns))
+    writer.stream = io.BytesIO()
+    reader.recorder = writer.recorder = recorder = ReplayRecorder()
+    start = time.perf_counter()
+    try:
+        play()
+    except EOFError:
+        pass
+    elapsed = time.perf_counter() - start
+    changed = [turn for turn, ((_, recorded), (_, replayed)) in enumerate(zip(turns, recorder.turns)) if recorded != replayed]
+    print(f"{len(recorder.turns)} turns in {elapsed * 1000:.0f} ms, commands differ in {len(changed)}", file=sys.stderr)
+    if changed:
+        turn = changed[0]
+        print(f"Turn {turn}: recorded {turns[turn][1]}, replayed {recorder.turns[turn][1]}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    # No arguments means a normal game, as on CodinGame
+    if len(sys.argv) == 3 and sys.argv[1] == "--replay":
+        replay(sys.argv[2])
+    else:
+        if len(sys.argv) == 3 and sys.argv[1] == "--record":
+            reader.recorder = writer.recorder = ReplayRecorder(sys.argv[2])
+        play()
 
 '''
 
@@ -0,0 +1,488 @@
+"""
+Local Soak Overflow referee: two bot processes play each other over the same
+stdin/stdout protocol as on CodinGame.
+
+    python soak_overflow_referee.py soak_overflow.py soak_overflow.py --games 100 --jobs 8
+    python soak_overflow_referee.py --engine-benchmark 20000
+
+A bot is either a path to a .py file (run with the current python and -u) or a quoted command.
+The simulation itself lives in SoakEngine, which works on flat per-tile and per-agent lists
+and has no I/O, so it can also be driven directly for offline evaluation and parameter sweeps.
+"""
+
+import os
+import sys
+import time
+import random
+import select
+import shlex
+import argparse
+import subprocess
+from collections import deque
+from multiprocessing import Pool
+
+MAX_TURNS = 100
+WINNING_LEAD = 600
+WETNESS_LIMIT = 100
+HEAVY_WETNESS = 50  # Distances count double for territory from here on
+BOMB_DAMAGE = 30
+THROW_DISTANCE = 4
+HUNKER_DOWN_PROTECTION = 0.25
+COVER_DEFENCE_VALUES = [0, 0.5, 0.75]
+
+FIRST_TURN_TIMEOUT = 1.0
+TURN_TIMEOUT = 0.1  # 50 ms on CodinGame, some slack for a loaded machine
+
+# shoot_cooldown, optimal_range, soaking_power, splash_bombs
+AGENT_CLASSES = {
+    "Gunner": (1, 4, 16, 1),
+    "Sniper": (5, 6, 24, 0),
+    "Bomber": (2, 2, 8, 3),
+    "Assault": (2, 4, 16, 2),
+    "Berserker": (5, 2, 32, 1),
+}
+
+MOVE, SHOOT, THROW, HUNKER_DOWN = range(4)
+
+
+class SoakEngine:
+    """
+    Full turn cycle on flat lists: agents are numbered 0..n-1, tiles by y * width + x.
+    Moves with collisions, hunkering, shots with cover, splash bombs, elimination and
+    territory scoring, in that order.
+    """
+    def __init__(self, width, height, tiles, agents):
+        """
+        tiles: flat list of tile types.
+        agents: list of (agent_id, player, x, y, shoot_cooldown, optimal_range, soaking_power, splash_bombs).
+        """
+        self.width = width
+        self.height = height
+        self.tiles = tiles
+        size = width * height
+        self.xs = [index % width for index in range(size)]
+        self.ys = [index // width for index in range(size)]
+        self.distances = [[abs(self.xs[a] - self.xs[b]) + abs(self.ys[a] - self.ys[b]) for b in range(size)] for a in range(size)]
+        self.neighbours = [[y * width + x for x, y in ((self.xs[i] + 1, self.ys[i]), (self.xs[i] - 1, self.ys[i]), (self.xs[i], self.ys[i] + 1), (self.xs[i], self.ys[i] - 1))
+                            if 0 <= x < width and 0 <= y < height] for i in range(size)]
+        self.protection = self.build_protection_table()
+        self.path_fields = {}
+
+        self.ids = [agent[0] for agent in agents]
+        self.players = [agent[1] for agent in agents]
+        self.positions = [agent[3] * width + agent[2] for agent in agents]
+        self.shoot_cooldowns = [agent[4] for agent in agents]
+        self.optimal_ranges = [agent[5] for agent in agents]
+        self.soaking_powers = [agent[6] for agent in agents]
+        self.bombs = [agent[7] for agent in agents]
+        self.cooldowns = [0] * len(agents)
+        self.wetness = [0] * len(agents)
+        self.alive = [True] * len(agents)
+        self.index_of = {agent_id: i for i, agent_id in enumerate(self.ids)}
+        self.scores = [0, 0]
+        self.turn = 0
+
+    def clone(self):
+        # Static tables are shared, only the per-agent state is copied
+        engine = object.__new__(SoakEngine)
+        engine.__dict__.update(self.__dict__)
+        for name in ("positions", "bombs", "cooldowns", "wetness", "alive", "scores"):
+            setattr(engine, name, list(getattr(self, name)))
+        return engine
+
+    def build_protection_table(self):
+        # Cover a target tile gets against a shooter tile, same rule as soak_overflow.is_covered
+        size = self.width * self.height
+        table = [[0.0] * size for _ in range(size)]
+        for target in range(size):
+            tx, ty = self.xs[target], self.ys[target]
+            covers = []
+            for dx, dy in ((-1, 0), (1, 0), (0, 1), (0, -1)):
+                cx, cy = tx + dx, ty + dy
+                if 0 <= cx < self.width and 0 <= cy < self.height and self.tiles[cy * self.width + cx] > 0:
+                    covers.append((cx, cy, tx + 2 * dx, ty + 2 * dy, COVER_DEFENCE_VALUES[self.tiles[cy * self.width + cx]]))
+            if not covers:
+                continue
+            row = table[target]
+            for shooter in range(size):
+                sx, sy = self.xs[shooter], self.ys[shooter]
+                distance = abs(sx - tx) + abs(sy - ty)
+                best = 0.0
+                for cx, cy, fx, fy, value in covers:
+                    if distance > abs(sx - fx) + abs(sy - fy) and abs(sx - cx) + abs(sy - cy) != 1 and value > best:
+                        best = value
+                row[shooter] = best
+        return table
+
+    def path_field(self, target):
+        # BFS distances to target over free tiles, cached per target
+        field = self.path_fields.get(target)
+        if field is None:
+            field = [-1] * (self.width * self.height)
+            field[target] = 0
+            queue = deque([target])
+            while queue:
+                now = queue.popleft()
+                for neighbour in self.neighbours[now]:
+                    if field[neighbour] == -1 and self.tiles[neighbour] == 0:
+                        field[neighbour] = field[now] + 1
+                        queue.append(neighbour)
+            self.path_fields[target] = field
+        return field
+
+    def next_step(self, position, target):
+        if position == target:
+            return position
+        field = self.path_field(target)
+        best = position
+        best_distance = field[position] if field[position] != -1 else 1 << 30
+        for neighbour in self.neighbours[position]:
+            if self.tiles[neighbour] == 0 and field[neighbour] != -1 and field[neighbour] < best_distance:
+                best, best_distance = neighbour, field[neighbour]
+        if best == position and field[position] == -1:
+            # Unreachable target: step to the free neighbour closest to it as the crow flies
+            distances = self.distances[target]
+            for neighbour in self.neighbours[position]:
+                if self.tiles[neighbour] == 0 and distances[neighbour] < distances[best]:
+                    best = neighbour
+        return best
+
+    def step(self, orders):
+        """
+        orders: {agent index: (move target tile or -1, action, argument)}, where argument is
+        the target agent index for SHOOT and the target tile for THROW.
+        """
+        alive = self.alive
+        positions = self.positions
+
+        # Moves: everybody picks a step, conflicting steps are cancelled until nothing changes
+        wanted = list(positions)
+        for i, (move_target, _, _) in orders.items():
+            if alive[i] and move_target >= 0:
+                wanted[i] = self.next_step(positions[i], move_target)
+        changed = True
+        while changed:
+            changed = False
+            claims = {}
+            for i in range(len(positions)):
+                if alive[i]:
+                    claims.setdefault(wanted[i], []).append(i)
+            for tile, claimants in claims.items():
+                if len(claimants) > 1:
+                    for i in claimants:
+                        if wanted[i] != positions[i]:
+                            wanted[i] = positions[i]
+                            changed = True
+        for i in range(len(positions)):
+            positions[i] = wanted[i]
+
+        hunkering = [False] * len(positions)
+        damage = [0.0] * len(positions)
+        for i, (_, action, argument) in orders.items():
+            if alive[i] and action == HUNKER_DOWN:
+                hunkering[i] = True
+        for i, (_, action, argument) in orders.items():
+            if not alive[i]:
+                continue
+            if action == SHOOT and self.cooldowns[i] == 0 and 0 <= argument < len(positions) and alive[argument] and self.players[argument] != self.players[i]:
+                distance = self.distances[positions[i]][positions[argument]]
+                if distance <= self.optimal_ranges[i] * 2:
+                    basic = self.soaking_powers[i] if distance <= self.optimal_ranges[i] else self.soaking_powers[i] / 2
+                    protection = self.protection[positions[argument]][positions[i]] + (HUNKER_DOWN_PROTECTION if hunkering[argument] else 0)
+                    damage[argument] += basic * max(1 - protection, 0)
+                    self.cooldowns[i] = self.shoot_cooldowns[i] + 1  # Decremented below, same turn
+            elif action == THROW and self.bombs[i] > 0 and 0 <= argument < len(self.tiles) and self.distances[positions[i]][argument] <= THROW_DISTANCE:
+                self.bombs[i] -= 1
+                tx, ty = self.xs[argument], self.ys[argument]
+                for j in range(len(positions)):
+                    if alive[j] and abs(self.xs[positions[j]] - tx) <= 1 and abs(self.ys[positions[j]] - ty) <= 1:
+                        damage[j] += BOMB_DAMAGE
+        for i in range(len(positions)):
+            if alive[i]:
+                self.wetness[i] = min(self.wetness[i] + round(damage[i]), WETNESS_LIMIT)
+                if self.wetness[i] >= WETNESS_LIMIT:
+                    alive[i] = False
+                self.cooldowns[i] = max(self.cooldowns[i] - 1, 0)
+
+        mine, theirs = self.territory()
+        if mine > theirs:
+            self.scores[0] += mine - theirs
+        elif theirs > mine:
+            self.scores[1] += theirs - mine
+        self.turn += 1
+
+    def territory(self):
+        # Tiles owned by player 0 and player 1
+        size = self.width * self.height
+        closest = []
+        for player in (0, 1):
+            rows = []
+            for i in range(len(self.positions)):
+                if self.alive[i] and self.players[i] == player:
+                    row = self.distances[self.positions[i]]
+                    rows.append([d * 2 for d in row] if self.wetness[i] >= HEAVY_WETNESS else row)
+            closest.append(list(map(min, *rows)) if len(rows) > 1 else (rows[0] if rows else [1 << 30] * size))
+        mine = sum(1 for a, b in zip(*closest) if a < b)
+        theirs = sum(1 for a, b in zip(*closest) if b < a)
+        return mine, theirs
+
+    @property
+    def is_over(self):
+        if self.turn >= MAX_TURNS or abs(self.scores[0] - self.scores[1]) >= WINNING_LEAD:
+            return True
+        return not all(any(alive and player == team for alive, player in zip(self.alive, self.players)) for team in (0, 1))
+
+    @property
+    def winner(self):
+        teams_alive = [any(alive and player == team for alive, player in zip(self.alive, self.players)) for team in (0, 1)]
+        if teams_alive[0] != teams_alive[1]:
+            return 0 if teams_alive[0] else 1
+        if self.scores[0] != self.scores[1]:
+            return 0 if self.scores[0] > self.scores[1] else 1
+        return -1
+
+    def initial_input(self, player):
+        lines = [str(player), str(len(self.ids))]
+        for i, agent_id in enumerate(self.ids):
+            lines.append(f"{agent_id} {self.players[i]} {self.shoot_cooldowns[i]} {self.optimal_ranges[i]} {self.soaking_powers[i]} {self.bombs[i]}")
+        lines.append(f"{self.width} {self.height}")
+        for y in range(self.height):
+            lines.append(" ".join(f"{x} {y} {self.tiles[y * self.width + x]}" for x in range(self.width)))
+        return "\n".join(lines) + "\n"
+
+    def turn_input(self, player):
+        lines = []
+        for i, agent_id in enumerate(self.ids):
+            if self.alive[i]:
+                lines.append(f"{agent_id} {self.xs[self.positions[i]]} {self.ys[self.positions[i]]} {self.cooldowns[i]} {self.bombs[i]} {self.wetness[i]}")
+        mine = sum(1 for i in range(len(self.ids)) if self.alive[i] and self.players[i] == player)
+        return f"{len(lines)}\n" + "\n".join(lines) + f"\n{mine}\n"
+
+    def parse_line(self, line, player, orders):
+        # "id;MOVE x y;SHOOT id;MESSAGE text", anything malformed is ignored
+        parts = line.split(";")
+        try:
+            i = self.index_of[int(parts[0])]
+        except (ValueError, KeyError):
+            return
+        if self.players[i] != player:
+            return
+        move_target, action, argument = -1, -1, -1
+        for part in parts[1:]:
+            words = part.split()
+            try:
+                if words[0] == "MOVE":
+                    x, y = int(words[1]), int(words[2])
+                    move_target = max(0, min(y, self.height - 1)) * self.width + max(0, min(x, self.width - 1))
+                elif words[0] == "SHOOT":
+                    action, argument = SHOOT, self.index_of.get(int(words[1]), -1)
+                elif words[0] == "THROW":
+                    x, y = int(words[1]), int(words[2])
+                    if 0 <= x < self.width and 0 <= y < self.height:
+                        action, argument = THROW, y * self.width + x
+                elif words[0] == "HUNKER_DOWN":
+                    action = HUNKER_DOWN
+            except (IndexError, ValueError):
+                pass
+        orders[i] = (move_target, action, argument)
+
+
+def generate_game(seed):
+    rng = random.Random(seed)
+    width = rng.randint(6, 10) * 2
+    height = rng.randint(6, 10)
+    tiles = [0] * (width * height)
+    # Point-symmetric covers, none in the spawn columns
+    for y in range(height):
+        for x in range(1, width // 2):
+            if rng.random() < 0.12:
+                tile = rng.choice([1, 2])
+                tiles[y * width + x] = tile
+                tiles[(height - 1 - y) * width + (width - 1 - x)] = tile
+    count = rng.randint(3, 5)
+    classes = [AGENT_CLASSES[name] for name in rng.sample(sorted(AGENT_CLASSES), count)]
+    rows = rng.sample(range(height), count)
+    agents = []
+    for player in (0, 1):
+        for k, stats in enumerate(classes):
+            x, y = (0, rows[k]) if player == 0 else (width - 1, height - 1 - rows[k])
+            agents.append((player * count + k + 1, player, x, y) + stats)
+    return SoakEngine(width, height, tiles, agents)
+
+
+class BotProcess:
+    """
+    A bot in its own process. Replies are read from the pipe with select so that a stuck bot
+    can't hold the referee longer than the timeout.
+    """
+    def __init__(self, command, show_stderr):
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=None if show_stderr else subprocess.DEVNULL)
+        self.buffer = b""
+        self.failed = False
+
+    def send(self, text):
+        try:
+            self.process.stdin.write(text.encode())
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            self.failed = True
+
+    def read_lines(self, count, timeout):
+        deadline = time.monotonic() + timeout
+        descriptor = self.process.stdout.fileno()
+        while self.buffer.count(b"\n") < count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            ready, _, _ = select.select([descriptor], [], [], remaining)
+            if not ready:
+                return None
+            chunk = os.read(descriptor, 65536)
+            if not chunk:
+                return None
+            self.buffer += chunk
+        lines = self.buffer.split(b"\n")
+        self.buffer = b"\n".join(lines[count:])
+        return [line.decode(errors="replace").strip() for line in lines[:count]]
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.kill()
+        self.process.wait()
+
+
+def bot_command(bot):
+    if bot.endswith(".py"):
+        return [sys.executable, "-u", bot]
+    return shlex.split(bot)
+
+
+def play_game(seed, bots, turn_timeout=TURN_TIMEOUT, show_stderr=False):
+    """
+    One game, bots[0] plays as player 0. A bot that crashes or doesn't answer in time loses,
+    its agents stand still for the rest of the game.
+    """
+    engine = generate_game(seed)
+    processes = [BotProcess(bot_command(bot), show_stderr) for bot in bots]
+    for player, process in enumerate(processes):
+        process.send(engine.initial_input(player))
+    try:
+        while not engine.is_over:
+            orders = {}
+            for player, process in enumerate(processes):
+                if process.failed:
+                    continue
+                process.send(engine.turn_input(player))
+                count = sum(1 for i in range(len(engine.ids)) if engine.alive[i] and engine.players[i] == player)
+                lines = process.read_lines(count, FIRST_TURN_TIMEOUT if engine.turn == 0 else turn_timeout)
+                if lines is None:
+                    process.failed = True
+                    continue
+                for line in lines:
+                    engine.parse_line(line, player, orders)
+            if all(process.failed for process in processes):
+                break
+            engine.step(orders)
+    finally:
+        for process in processes:
+            process.close()
+
+    failed = [process.failed for process in processes]
+    winner = engine.winner
+    if failed[0] != failed[1]:
+        winner = 1 if failed[0] else 0
+    return {"seed": seed, "scores": engine.scores, "turns": engine.turn, "failed": failed, "winner": winner}
+
+
+def play_match(arguments):
+    # Even seeds: first bot is player 0, odd seeds: the other way round
+    seed, bots, turn_timeout, show_stderr = arguments
+    swapped = seed % 2 == 1
+    result = play_game(seed, bots[::-1] if swapped else bots, turn_timeout, show_stderr)
+    if swapped:
+        result["scores"] = result["scores"][::-1]
+        result["failed"] = result["failed"][::-1]
+        if result["winner"] != -1:
+            result["winner"] = 1 - result["winner"]
+    return result
+
+
+def benchmark_engine(turns, seed=0, maps=8):
+    # Random orders on a fixed set of maps, restarting games from clones as they end
+    rng = random.Random(seed)
+    templates = [generate_game(seed + i) for i in range(maps)]
+    engine = templates[0].clone()
+    games = 1
+    start = time.perf_counter()
+    for _ in range(turns):
+        if engine.is_over:
+            engine = templates[games % maps].clone()
+            games += 1
+        orders = {}
+        for i in range(len(engine.ids)):
+            if not engine.alive[i]:
+                continue
+            enemies = [j for j in range(len(engine.ids)) if engine.alive[j] and engine.players[j] != engine.players[i]]
+            action = rng.choice([SHOOT, SHOOT, THROW, HUNKER_DOWN])
+            if action == SHOOT and enemies:
+                argument = rng.choice(enemies)
+            else:
+                argument = engine.positions[rng.choice(enemies)] if enemies else -1
+            # Everybody pushes towards a random enemy, like real bots do
+            orders[i] = (engine.positions[rng.choice(enemies)] if enemies else -1, action, argument)
+        engine.step(orders)
+    elapsed = time.perf_counter() - start
+    print(f"{turns} turns over {games} games in {elapsed:.2f}s ({turns / elapsed:.0f} turns/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Soak Overflow referee")
+    parser.add_argument("bot1", nargs="?")
+    parser.add_argument("bot2", nargs="?")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game, the rest follow")
+    parser.add_argument("--turn-timeout", type=float, default=TURN_TIMEOUT)
+    parser.add_argument("--show-stderr", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="print every game")
+    parser.add_argument("--engine-benchmark", type=int, metavar="TURNS", help="time the engine alone and exit")
+    args = parser.parse_args()
+
+    if args.engine_benchmark:
+        benchmark_engine(args.engine_benchmark, args.seed)
+        return
+    if not args.bot1 or not args.bot2:
+        parser.error("two bots are required")
+
+    bots = [args.bot1, args.bot2]
+    tasks = [(args.seed + i, bots, args.turn_timeout, args.show_stderr) for i in range(args.games)]
+    wins = [0, 0]
+    draws = 0
+    failures = [0, 0]
+    total_scores = [0, 0]
+    start = time.perf_counter()
+    with Pool(args.jobs) as pool:
+        for result in pool.imap_unordered(play_match, tasks):
+            if args.verbose:
+                print(f"seed {result['seed']}: {result['scores'][0]} - {result['scores'][1]} in {result['turns']} turns"
+                      + (f", failed {result['failed']}" if any(result["failed"]) else ""))
+            if result["winner"] == -1:
+                draws += 1
+            else:
+                wins[result["winner"]] += 1
+            for i in range(2):
+                total_scores[i] += result["scores"][i]
+                failures[i] += result["failed"][i]
+    elapsed = time.perf_counter() - start
+
+    for i in range(2):
+        print(f"{bots[i]}: {wins[i]} wins, average score {total_scores[i] / args.games:.1f}, {failures[i]} failures")
+    print(f"{draws} draws, {args.games} games in {elapsed:.1f}s ({args.games / elapsed * 60:.0f} games/min)")
+
+
+if __name__ == "__main__":
+    main()